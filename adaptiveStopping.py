@@ -0,0 +1,164 @@
+###############################
+#Name: adaptiveStopping.py
+#Created by: XXX
+#Created: XXX
+#Desc: Program implements a sequential-sampling controller for simulation campaigns. The
+# campaign is split into strata (netType x tsMethod x netSize bin). For each stratum, the
+# controller tracks the mean and the confidence-interval half-width of chosen graphSum
+# correlations (e.g., Ci_DD). It hands out the next sim_id and stratum to whichever
+# constraintSim instance asks, preferring strata whose intervals are furthest from their
+# targets, and stops the campaign once every stratum meets every target.
+#Depends on: constraintSimParams.py (cSP)
+#Used by: multiProcWrapper.py, constraintSim.py
+#Notes:
+# 1/ Configurable parameters (adaptive*) exist in constraintSimParams.py. With
+#  cSP.adaptiveStopping = 1, numSimNets is ignored.
+# 2/ Half-widths are z*sd/sqrt(n) on the correlation (r) scale, using a normal critical value.
+#  A stratum's interval is not trusted until it has adaptiveMinSims finished sims.
+# 3/ Strata with sims still in flight are scored as if those sims had finished with the
+#  current sd, so several cores do not all pile onto the same stratum. A stratum can still
+#  overshoot its target by the few sims that were in flight when it converged.
+# 4/ sim_ids are issued centrally, starting from cSP.adaptiveStartId or the DB's first unused
+#  sim_id (firstId), whichever is larger, so they stay unique across cores and runs
+#  regardless of how many sims each core ends up running.
+# 5/ The controller lives in a multiprocessing manager process; constraintSim instances talk
+#  to it through a proxy.
+# 6/ A constraintSim instance that fails between nextSim and record releases its sim, so the
+#  stratum's in-flight count (note 3) does not stay inflated. A process killed outright
+#  cannot do this.
+###############################
+
+###############################
+#STEP 0: Import modules/functions
+###############################
+
+import math
+import statistics
+import threading
+from multiprocessing.managers import BaseManager
+
+###############################
+#Define AdaptiveController to allocate sims across strata until target precision is met
+###############################
+
+class AdaptiveController:
+
+ def __init__(self, strata, targets, minSims = 30, maxSims = 100000, confidence = 0.95,
+  startId = 0):
+
+  self.strata = [tuple(s) for s in strata]
+  self.targets = dict(targets)
+  self.minSims = minSims
+  self.maxSims = maxSims
+  self.z = statistics.NormalDist().inv_cdf(0.5 + confidence/2)
+  self.nextId = startId
+  self.issued = 0
+  self.lock = threading.Lock()
+
+  #Welford running [n, mean, M2] per stratum and target correlation
+  self.stats = {s: {k: [0, 0.0, 0.0] for k in self.targets} for s in self.strata}
+  self.finished = dict.fromkeys(self.strata, 0)
+  self.inFlight = dict.fromkeys(self.strata, 0)
+
+ def halfWidth(self, stratum, name, extra = 0):
+
+  n, mean, M2 = self.stats[stratum][name]
+  if n < 2:
+   return(math.inf)
+  sd = math.sqrt(M2/(n - 1))
+  return(self.z*sd/math.sqrt(n + extra))
+
+ def shortfall(self, stratum):
+
+  #largest ratio of (projected) half-width to target; <= 1 means the stratum has converged
+  n = self.finished[stratum]
+  if n + self.inFlight[stratum] < self.minSims:
+   return(math.inf)
+  return(max(self.halfWidth(stratum, k, self.inFlight[stratum])/t
+   for k, t in self.targets.items()))
+
+ def converged(self, stratum):
+
+  if self.finished[stratum] < self.minSims:
+   return(False)
+  return(all(self.halfWidth(stratum, k) <= t for k, t in self.targets.items()))
+
+ def done(self):
+
+  with self.lock:
+   return(self.issued >= self.maxSims or all(self.converged(s) for s in self.strata))
+
+ def nextSim(self):
+
+  #returns (sim_id, stratum), or (None, None) once the campaign should stop
+  with self.lock:
+   if self.issued >= self.maxSims:
+    return(None, None)
+   openStrata = [s for s in self.strata if not self.converged(s)]
+   if not openStrata:
+    return(None, None)
+
+   #strata below minSims first (fewest sims first), then the largest shortfall
+   stratum = max(openStrata, key = lambda s: (self.shortfall(s),
+    -(self.finished[s] + self.inFlight[s])))
+
+   self.inFlight[stratum] += 1
+   self.issued += 1
+   sim_id = self.nextId
+   self.nextId += 1
+   return(sim_id, stratum)
+
+ def release(self, stratum):
+
+  #gives back an issued sim that will never be recorded (its constraintSim instance failed)
+  with self.lock:
+   self.inFlight[tuple(stratum)] -= 1
+
+ def record(self, stratum, values):
+
+  stratum = tuple(stratum)
+  with self.lock:
+   self.inFlight[stratum] -= 1
+   self.finished[stratum] += 1
+   for k in self.targets:
+    r = values[k]
+    if r is None or math.isnan(r):
+     r = 0.0
+    cell = self.stats[stratum][k]
+    cell[0] += 1
+    delta = r - cell[1]
+    cell[1] += delta/cell[0]
+    cell[2] += delta*(r - cell[1])
+
+ def summary(self):
+
+  with self.lock:
+   rows = []
+   for s in self.strata:
+    row = {'stratum': s, 'n': self.finished[s], 'converged': self.converged(s)}
+    for k in self.targets:
+     row[k] = (self.stats[s][k][1], self.halfWidth(s, k))
+    rows.append(row)
+   return(rows)
+
+###############################
+#Define manager and helper to start a shared controller from constraintSimParams
+###############################
+
+class ControllerManager(BaseManager):
+ pass
+
+ControllerManager.register('AdaptiveController', AdaptiveController)
+
+def startController(cSP, firstId = 0):
+
+ strata = [(netType, tsMethod, minSize, maxSize)
+  for netType in cSP.adaptiveNetTypes
+  for tsMethod in cSP.adaptiveTsMethods
+  for minSize, maxSize in cSP.adaptiveSizeBins]
+
+ manager = ControllerManager()
+ manager.start()
+ controller = manager.AdaptiveController(strata, cSP.adaptiveTargets, cSP.adaptiveMinSims,
+  cSP.adaptiveMaxSims, cSP.adaptiveConfidence, max(cSP.adaptiveStartId, firstId))
+ return(manager, controller)
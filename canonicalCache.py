@@ -0,0 +1,209 @@
+###############################
+#Name: canonicalCache.py
+#Created by: XXX
+#Created: XXX
+#Desc: Program implements a result cache for small generated graphs. Isomorphic graphs with
+# the same (quantized) tie strengths, concentrations, directedness, and tsMethod have the
+# same decomposition, so constraintSim looks each weighted graph up here before computing its
+# metrics and decomposing it. A hit copies the cached node, edge, and graph results onto the
+# new graph through the isomorphism between the two.
+#Depends on: constraintDecomp.py
+#Used by: constraintSim.py
+#Notes:
+# 1/ Configurable parameters (canonicalCache*) exist in constraintSimParams.py.
+# 2/ networkx has no canonical labeling, so graphs are bucketed by a Weisfeiler-Lehman style
+#  invariant hash (colour refinement over quantized weights and concentrations), and a bucket
+#  hit is confirmed, and its node mapping found, with networkx's (Di)GraphMatcher. Graphs in
+#  different buckets are never isomorphic; graphs in one bucket usually are.
+# 3/ Weights and concentrations are rounded to multiples of canonicalCacheQuantum before
+#  hashing and matching. Under 'equal' tie strengths every tie is 1.0, so isomorphic
+#  topologies hit; continuous tie strengths almost never do.
+# 4/ The cache holds at most canonicalCacheMaxSize graphs and evicts the least recently used.
+#  With canonicalCacheFile set, it is loaded at start and merged back into the file (pickle)
+#  at the end of a constraintSim instance, so it carries across runs and instances.
+#  Instances save one at a time: each holds '<canonicalCacheFile>.lock', created exclusively,
+#  while it reads, merges, and replaces the file, so no instance's entries are overwritten by
+#  another's. A lock file older than lockTimeout seconds is taken to be left by an instance
+#  that died while saving, and is removed.
+# 5/ Bootstrap standard errors (constraintDecomp note 10) are reused from the cached graph
+#  rather than redrawn.
+# 6/ Lookups and hits are counted per (netType, netSize); report() prints the hit rates.
+###############################
+
+###############################
+#STEP 0: Import modules/functions
+###############################
+
+import hashlib
+import os
+import pickle
+import time
+from collections import OrderedDict
+from networkx.algorithms import isomorphism
+
+from constraintDecomp import corrPairs
+
+#graph-level results that graphMetrics and constraintDecomp add
+resultKeys = ['avgCC', 'transitivity'] + [k for k, a, b in corrPairs] + \
+ [k + '_se' for k, a, b in corrPairs]
+
+#edge attributes that are inputs rather than results
+inputEdgeAttrs = ['weight', 'freq']
+
+###############################
+#STEP 1: Invariant hash of a weighted graph
+###############################
+
+def digest(x):
+ return(hashlib.sha1(repr(x).encode()).hexdigest()[:16])
+
+def canonicalKey(net, quantum, rounds = 3):
+
+ q = lambda x: int(round(x/quantum))
+ directed = net.is_directed()
+ #each node starts from its concentration, then repeatedly absorbs the sorted (tie strength,
+  #alter label) lists of its out- and in-ties
+ labels = {i: digest(q(net.nodes[i]['conc'])) for i in net}
+ for r in range(rounds):
+  new = {}
+  for i in net:
+   out = sorted((q(d['weight']), labels[j]) for j, d in net[i].items())
+   if directed:
+    into = sorted((q(d['weight']), labels[j]) for j, d in net.pred[i].items())
+   else:
+    into = []
+   new[i] = digest((labels[i], out, into))
+  labels = new
+
+ return(digest((directed, net.graph['tsMethod'], len(net), net.number_of_edges(),
+  sorted(labels.values()))))
+
+###############################
+#Define CanonicalCache to store and reuse results for isomorphic weighted graphs
+###############################
+
+class CanonicalCache:
+
+ def __init__(self, maxSize = 10000, quantum = 1e-9, path = None, maxNetSize = 30):
+
+  self.maxSize = maxSize
+  self.quantum = quantum
+  self.path = path
+  self.maxNetSize = maxNetSize
+  #key -> list of cached graphs sharing that hash, least recently used first
+  self.entries = OrderedDict()
+  self.size = 0
+  #(netType, netSize) -> [lookups, hits]
+  self.counts = {}
+  if path is not None and os.path.exists(path):
+   with open(path, 'rb') as f:
+    for key, graphs in pickle.load(f).items():
+     for g in graphs:
+      self.add(key, g)
+
+ def add(self, key, g):
+
+  self.entries.setdefault(key, []).append(g)
+  self.entries.move_to_end(key)
+  self.size += 1
+  while self.size > self.maxSize:
+   oldKey, graphs = self.entries.popitem(last = False)
+   self.size -= len(graphs)
+
+ def matcher(self, net, g):
+
+  q = lambda x: int(round(x/self.quantum))
+  nodeMatch = lambda a, b: q(a['conc']) == q(b['conc'])
+  edgeMatch = lambda a, b: q(a['weight']) == q(b['weight'])
+  if net.is_directed():
+   return(isomorphism.DiGraphMatcher(net, g, node_match = nodeMatch, edge_match = edgeMatch))
+  return(isomorphism.GraphMatcher(net, g, node_match = nodeMatch, edge_match = edgeMatch))
+
+ def lookup(self, net):
+
+  #on a hit, copies the cached results onto net and returns True
+  if len(net) > self.maxNetSize:
+   return(False)
+  cell = self.counts.setdefault((net.graph['netType'], net.graph['netSize']), [0, 0])
+  cell[0] += 1
+  key = canonicalKey(net, self.quantum)
+  for g in self.entries.get(key, []):
+   gm = self.matcher(net, g)
+   if not gm.is_isomorphic():
+    continue
+   m = gm.mapping
+   for i in net:
+    net.nodes[i].update(g.nodes[m[i]])
+   for i, j, d in net.edges(data = True):
+    d.update((k, v) for k, v in g.edges[m[i], m[j]].items() if k not in inputEdgeAttrs)
+   net.graph.update(g.graph)
+   net.graph['cacheHit'] = 1
+   self.entries.move_to_end(key)
+   cell[1] += 1
+   return(True)
+  return(False)
+
+ def store(self, net):
+
+  #keep a copy of a decomposed graph's results, without the triangle/wedge pass
+  if len(net) > self.maxNetSize:
+   return
+  g = net.copy()
+  g.graph = {k: net.graph[k] for k in resultKeys if k in net.graph}
+  self.add(canonicalKey(net, self.quantum), g)
+
+ def lock(self, lockTimeout = 60.0, pollInterval = 0.05):
+
+  #waits until this instance holds the cache file's lock (note 4)
+  lockPath = self.path + '.lock'
+  while True:
+   try:
+    os.close(os.open(lockPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    return(lockPath)
+   except FileExistsError:
+    try:
+     if time.time() - os.path.getmtime(lockPath) > lockTimeout:
+      os.remove(lockPath)
+      continue
+    except FileNotFoundError:
+     continue
+    time.sleep(pollInterval)
+
+ def save(self):
+
+  #merge with whatever other instances have saved, then replace the file in one step
+  if self.path is None:
+   return
+  lockPath = self.lock()
+  try:
+   self.merge()
+  finally:
+   os.remove(lockPath)
+
+ def merge(self):
+
+  #save's read-merge-replace, run while holding the lock
+  if os.path.exists(self.path):
+   with open(self.path, 'rb') as f:
+    saved = pickle.load(f)
+   for key, graphs in saved.items():
+    if key not in self.entries:
+     self.entries[key] = graphs
+     self.entries.move_to_end(key, last = False)
+     self.size += len(graphs)
+   while self.size > self.maxSize:
+    oldKey, graphs = self.entries.popitem(last = False)
+    self.size -= len(graphs)
+  tmp = '%s.%d' % (self.path, os.getpid())
+  with open(tmp, 'wb') as f:
+   pickle.dump(dict(self.entries), f)
+  os.replace(tmp, self.path)
+
+ def hitRates(self):
+
+  return({k: (n, hits, hits/n) for k, (n, hits) in sorted(self.counts.items())})
+
+ def report(self):
+
+  for (netType, netSize), (n, hits, rate) in self.hitRates().items():
+   print('cache %s n=%s: %s/%s hits (%.2f)' % (netType, netSize, hits, n, rate))
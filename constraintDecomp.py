@@ -8,6 +8,7 @@
 # original Python graph object with constraint, constraint-level properties as node-level 
 # attributes, and pairwise correlations of constraint's components as graph-level attributes. 
 #Depends on: 
+# graphTriangles.py
 #Used by: constraintSim.py
 #Notes:
 # 1/ For robustness across applications, should add a step to delete self-referencing edges. Or
@@ -23,6 +24,24 @@
 #  dependence.
 # 6/ This does not isolate the Cov(Oj, pij) term, though it could by subtracting size and 
 #  variance from DD.
+# 7/ constraintDecompEgos computes the same node-level terms for a subset of egos only. It reads
+#  each ego's alters, the ties among them, and the alters' volumes, so its cost scales with
+#  the egos' two-hop neighborhoods rather than with the whole graph. It does not copy the
+#  graph, and it returns a dict of terms by ego instead of an updated graph (no correlations).
+# 8/ Shared alters come from the triangle/wedge pass (graphTriangles.py) that graphGen stores
+#  in net.graph['triWedge']. If the graph has no valid pass (e.g., it was not built by
+#  graphGen), one is computed here. Graphs with self-loops fall back to set intersections.
+# 9/ Undirected input (graphGen with symmetric == 1) is decomposed by constraintDecompSym,
+#  which keeps each tie once instead of forcing a DiGraph. With symmetric ties, 
+#  pij = wij/si and pji = wij/sj (si = i's tie-strength total), so the shared-alter sums
+#  and open quadriads of tie (i, j) are computed once and scaled for both i and j. No
+#  reverse-edge fill is needed. Node-level attributes match the DiGraph path. Edge-level 
+#  pij and aggIndirect are not stored on this path, because one undirected edge cannot 
+#  hold both directions; the returned graph stays undirected.
+# 10/ With bootstrapReps = B > 0, the egos are resampled B times with replacement (one B x n
+#  index matrix) and every correlation in corrPairs is recomputed for all resamples in one
+#  batched numpy computation. The standard deviation across resamples is stored as
+#  '<correlation>_se'. With B = 0 the _se attributes are None.
 ###############################
 
 ###############################
@@ -35,11 +54,60 @@ import decimal
 import numpy as np
 import pandas as pd
 
+from graphTriangles import triangleWedgePass, triWedgeValid
+
+###############################
+#Graph-level correlations: (graph attribute, node attribute, node attribute)
+###############################
+
+corrPairs = [('Ci_DD', 'Ci', 'DD'), ('Ci_sizeEffect', 'Ci', 'sizeEffect'),
+ ('Ci_varEffect', 'Ci', 'varEffect'), ('Ci_ID', 'Ci', 'ID'), ('Ci_TB', 'Ci', 'TB'),
+ ('Ci_QS', 'Ci', 'QS'), ('Ci_OQD', 'Ci', 'IR'), ('Ci_CQD', 'Ci', 'CC'),
+ ('Ci_betweenness', 'Ci', 'betweenness'), ('Ci_clustering', 'Ci', 'clustering'),
+ ('Ci_degree', 'Ci', 'degree'), ('DD_sizeEffect', 'DD', 'sizeEffect'),
+ ('DD_varEffect', 'DD', 'varEffect'), ('DD_ID', 'DD', 'ID'), ('DD_TB', 'DD', 'TB'),
+ ('DD_QS', 'DD', 'QS'), ('DD_OQD', 'DD', 'IR'), ('DD_CQD', 'DD', 'CC'),
+ ('DD_betweenness', 'DD', 'betweenness'), ('DD_clustering', 'DD', 'clustering'),
+ ('DD_degree', 'DD', 'degree'), ('sizeEffect_varEffect', 'sizeEffect', 'varEffect'),
+ ('sizeEffect_ID', 'sizeEffect', 'ID'), ('sizeEffect_TB', 'sizeEffect', 'TB'),
+ ('sizeEffect_QS', 'sizeEffect', 'QS'), ('sizeEffect_OQD', 'sizeEffect', 'IR'),
+ ('sizeEffect_CQD', 'sizeEffect', 'CC'),
+ ('sizeEffect_betweenness', 'sizeEffect', 'betweenness'),
+ ('sizeEffect_clustering', 'sizeEffect', 'clustering'),
+ ('sizeEffect_degree', 'sizeEffect', 'degree'), ('varEffect_ID', 'varEffect', 'ID'),
+ ('varEffect_TB', 'varEffect', 'TB'), ('varEffect_QS', 'varEffect', 'QS'),
+ ('varEffect_OQD', 'varEffect', 'IR'), ('varEffect_CQD', 'varEffect', 'CC'),
+ ('varEffect_betweenness', 'varEffect', 'betweenness'),
+ ('varEffect_clustering', 'varEffect', 'clustering'),
+ ('varEffect_degree', 'varEffect', 'degree'), ('ID_TB', 'ID', 'TB'), ('ID_QS', 'ID', 'QS'),
+ ('ID_OQD', 'ID', 'IR'), ('ID_CQD', 'ID', 'CC'), ('ID_betweenness', 'ID', 'betweenness'),
+ ('ID_clustering', 'ID', 'clustering'), ('ID_degree', 'ID', 'degree'), ('TB_QS', 'TB', 'QS'),
+ ('TB_OQD', 'TB', 'IR'), ('TB_CQD', 'TB', 'CC'), ('TB_betweenness', 'TB', 'betweenness'),
+ ('TB_clustering', 'TB', 'clustering'), ('TB_degree', 'TB', 'degree'), ('QS_OQD', 'QS', 'IR'),
+ ('QS_CQD', 'QS', 'CC'), ('QS_betweenness', 'QS', 'betweenness'),
+ ('QS_clustering', 'QS', 'clustering'), ('QS_degree', 'QS', 'degree'), ('OQD_CQD', 'IR', 'CC'),
+ ('OQD_betweenness', 'IR', 'betweenness'), ('OQD_clustering', 'IR', 'clustering'),
+ ('OQD_degree', 'IR', 'degree'), ('CQD_betweenness', 'CC', 'betweenness'),
+ ('CQD_clustering', 'CC', 'clustering'), ('CQD_degree', 'CC', 'degree'),
+ ('betweenness_clustering', 'betweenness', 'clustering'),
+ ('betweenness_degree', 'betweenness', 'degree'),
+ ('betweenness_C_net_size', 'betweenness', 'C_net_size'),
+ ('betweenness_C_net_var', 'betweenness', 'C_net_var'),
+ ('betweenness_C_net_DD', 'betweenness', 'C_net_DD'),
+ ('clustering_degree', 'clustering', 'degree'),
+ ('clustering_C_net_size', 'clustering', 'C_net_size'),
+ ('clustering_C_net_var', 'clustering', 'C_net_var'),
+ ('clustering_C_net_DD', 'clustering', 'C_net_DD')]
+
 ###############################
 #Define constraintDecomp as while loop over nodes in input network object
 ###############################
 
-def constraintDecomp(net):
+def constraintDecomp(net, bootstrapReps = 0):
+
+ #symmetric (undirected) input takes the symmetric fast path (see note 9)
+ if not net.is_directed() and nx.number_of_selfloops(net) == 0:
+  return(constraintCorrs(constraintDecompSym(net), bootstrapReps))
 
  ###############################
  #STEP 1: Prepare graph
@@ -134,6 +202,14 @@ def constraintDecomp(net):
  #  quadratic stuff. 
  ###############################
 
+ #reuse graphGen's triangle/wedge pass if it still describes this graph
+ tw = net.graph.get('triWedge')
+ if nx.number_of_selfloops(net) > 0:
+  tw = None
+ elif not triWedgeValid(tw, net):
+  tw = triangleWedgePass(net)
+  net.graph['triWedge'] = tw
+
  for i in net:
 
   #Create some node attributes. Force constraint = 1 if ego is an isolate
@@ -168,11 +244,14 @@ def constraintDecomp(net):
 
    #find shared alters. since we've already verified that i->j exists if j-> exists,
     #we're sure to get successors and predecessors for both i and j.
-   #convert lists of i's and j's alters to two sets
-   ai = set(net.successors(i))
-   aj = set(net.successors(j))
-   #find intersection and convert to list -- iteration should be faster than over set
-   sharedAlters = list(ai&aj)
+   if tw is not None:
+    sharedAlters = tw['shared'][(i, j)]
+   else:
+    #convert lists of i's and j's alters to two sets
+    ai = set(net.successors(i))
+    aj = set(net.successors(j))
+    #find intersection and convert to list -- iteration should be faster than over set
+    sharedAlters = list(ai&aj)
 
    for q in sharedAlters:
     net.edges[i, j]['aggIndirect'] += net.edges[i, q]['pij']*net.edges[q, j]['pij']
@@ -185,7 +264,10 @@ def constraintDecomp(net):
 
     #Quadratic stuff
     #find all of q's alters
-    aq = set(net.successors(q))
+    if tw is not None:
+     aq = tw['nbrs'][q]
+    else:
+     aq = set(net.successors(q))
     
     #comment all of this out. instead rely on: QS = CC + IR, and QS = term3 - ID
     ##for mutual alters of j, q, and k; compute community closure
@@ -224,6 +306,14 @@ def constraintDecomp(net):
   #net.node[i]['QS'] = net.node[i]['term3'] - net.node[i]['ID']
   net.nodes[i]['CC'] = net.nodes[i]['Ci'] - (net.nodes[i]['DD'] + net.nodes[i]['TB']  + net.nodes[i]['ID'] + net.nodes[i]['IR'])
 
+ return(constraintCorrs(net, bootstrapReps))
+
+###############################
+#Define constraintCorrs to add derived node attributes and graph-level correlations
+###############################
+
+def constraintCorrs(net, bootstrapReps = 0):
+
  ###############################
  #STEP 4: Generate node attribute correlation matrix, and add correlations
  # as graph attributes
@@ -247,92 +337,231 @@ def constraintDecomp(net):
  corrs.fillna(0.0, inplace = True)
 
  #add correlations as graph attributes
- net.graph['Ci_DD'] = corrs.at["Ci", "DD"]
- net.graph['Ci_sizeEffect'] = corrs.at["Ci", "sizeEffect"]
- net.graph['Ci_varEffect'] = corrs.at["Ci", "varEffect"]
- net.graph['Ci_ID'] = corrs.at["Ci", "ID"]
- net.graph['Ci_TB'] = corrs.at["Ci", "TB"]
- net.graph['Ci_QS'] = corrs.at["Ci", "QS"]
- net.graph['Ci_OQD'] = corrs.at["Ci", "IR"]
- net.graph['Ci_CQD'] = corrs.at["Ci", "CC"]
- net.graph['Ci_betweenness'] = corrs.at["Ci", "betweenness"]
- net.graph['Ci_clustering'] = corrs.at["Ci", "clustering"]
- net.graph['Ci_degree'] = corrs.at["Ci", "degree"]
-
- net.graph['DD_sizeEffect'] = corrs.at["DD", "sizeEffect"]
- net.graph['DD_varEffect'] = corrs.at["DD", "varEffect"]
- net.graph['DD_ID'] = corrs.at["DD", "ID"]
- net.graph['DD_TB'] = corrs.at["DD", "TB"]
- net.graph['DD_QS'] = corrs.at["DD", "QS"]
- net.graph['DD_OQD'] = corrs.at["DD", "IR"]
- net.graph['DD_CQD'] = corrs.at["DD", "CC"]
- net.graph['DD_betweenness'] = corrs.at["DD", "betweenness"]
- net.graph['DD_clustering'] = corrs.at["DD", "clustering"]
- net.graph['DD_degree'] = corrs.at["DD", "degree"]
-
- net.graph['sizeEffect_varEffect'] = corrs.at["sizeEffect", "varEffect"]
- net.graph['sizeEffect_ID'] = corrs.at["sizeEffect", "ID"]
- net.graph['sizeEffect_TB'] = corrs.at["sizeEffect", "TB"]
- net.graph['sizeEffect_QS'] = corrs.at["sizeEffect", "QS"]
- net.graph['sizeEffect_OQD'] = corrs.at["sizeEffect", "IR"]
- net.graph['sizeEffect_CQD'] = corrs.at["sizeEffect", "CC"]
- net.graph['sizeEffect_betweenness'] = corrs.at["sizeEffect", "betweenness"]
- net.graph['sizeEffect_clustering'] = corrs.at["sizeEffect", "clustering"]
- net.graph['sizeEffect_degree'] = corrs.at["sizeEffect", "degree"]
-
- net.graph['varEffect_ID'] = corrs.at["varEffect", "ID"]
- net.graph['varEffect_TB'] = corrs.at["varEffect", "TB"]
- net.graph['varEffect_QS'] = corrs.at["varEffect", "QS"]
- net.graph['varEffect_OQD'] = corrs.at["varEffect", "IR"]
- net.graph['varEffect_CQD'] = corrs.at["varEffect", "CC"]
- net.graph['varEffect_betweenness'] = corrs.at["varEffect", "betweenness"]
- net.graph['varEffect_clustering'] = corrs.at["varEffect", "clustering"]
- net.graph['varEffect_degree'] = corrs.at["varEffect", "degree"]
-
- net.graph['ID_TB'] = corrs.at["ID", "TB"]
- net.graph['ID_QS'] = corrs.at["ID", "QS"]
- net.graph['ID_OQD'] = corrs.at["ID", "IR"]
- net.graph['ID_CQD'] = corrs.at["ID", "CC"]
- net.graph['ID_betweenness'] = corrs.at["ID", "betweenness"]
- net.graph['ID_clustering'] = corrs.at["ID", "clustering"]
- net.graph['ID_degree'] = corrs.at["ID", "degree"]
-
- net.graph['TB_QS'] = corrs.at["TB", "QS"]
- net.graph['TB_OQD'] = corrs.at["TB", "IR"]
- net.graph['TB_CQD'] = corrs.at["TB", "CC"]
- net.graph['TB_betweenness'] = corrs.at["TB", "betweenness"]
- net.graph['TB_clustering'] = corrs.at["TB", "clustering"]
- net.graph['TB_degree'] = corrs.at["TB", "degree"]
-
- net.graph['QS_OQD'] = corrs.at["QS", "IR"]
- net.graph['QS_CQD'] = corrs.at["QS", "CC"]
- net.graph['QS_betweenness'] = corrs.at["QS", "betweenness"]
- net.graph['QS_clustering'] = corrs.at["QS", "clustering"]
- net.graph['QS_degree'] = corrs.at["QS", "degree"]
-
- net.graph['OQD_CQD'] = corrs.at["IR", "CC"]
- net.graph['OQD_betweenness'] = corrs.at["IR", "betweenness"]
- net.graph['OQD_clustering'] = corrs.at["IR", "clustering"]
- net.graph['OQD_degree'] = corrs.at["IR", "degree"]
-
- net.graph['CQD_betweenness'] = corrs.at["CC", "betweenness"]
- net.graph['CQD_clustering'] = corrs.at["CC", "clustering"]
- net.graph['CQD_degree'] = corrs.at["CC", "degree"]
-
- net.graph['betweenness_clustering'] = corrs.at["betweenness", "clustering"]
- net.graph['betweenness_degree'] = corrs.at["betweenness", "degree"]
- net.graph['betweenness_C_net_size'] = corrs.at["betweenness", "C_net_size"]
- net.graph['betweenness_C_net_var'] = corrs.at["betweenness", "C_net_var"]
- net.graph['betweenness_C_net_DD'] = corrs.at["betweenness", "C_net_DD"]
-	
- net.graph['clustering_degree'] = corrs.at["clustering", "degree"]
- net.graph['clustering_C_net_size'] = corrs.at["clustering", "C_net_size"]
- net.graph['clustering_C_net_var'] = corrs.at["clustering", "C_net_var"]
- net.graph['clustering_C_net_DD'] = corrs.at["clustering", "C_net_DD"]
+ for key, a, b in corrPairs:
+  net.graph[key] = corrs.at[a, b]
+
+ #optionally, add bootstrap standard errors of the same correlations (see note 10)
+ if bootstrapReps > 0:
+  se = bootstrapCorrSE(df, bootstrapReps)
+ else:
+  se = {}
+ for key, a, b in corrPairs:
+  net.graph[key + '_se'] = se.get(key)
 
  ###############################
  #STEP 5: Return updated graph
  ###############################
 
  #return updated graph
- return(net)
\ No newline at end of file
+ return(net)
+
+###############################
+#Define bootstrapCorrSE to compute bootstrap standard errors of the corrPairs correlations
+###############################
+
+def bootstrapCorrSE(df, reps):
+
+ #ego-by-attribute matrix for the attributes used in corrPairs
+ names = sorted(set([a for k, a, b in corrPairs] + [b for k, a, b in corrPairs]))
+ col = {name: c for c, name in enumerate(names)}
+ X = df[names].to_numpy(dtype = float)
+ n = X.shape[0]
+
+ #draw all resamples as one index matrix, then compute correlations in blocks of resamples
+  #to bound memory (block x n x attributes floats)
+ idx = np.random.randint(0, n, size = (reps, n))
+ block = max(1, 2000000//max(n*len(names), 1))
+ r = np.empty((reps, len(names), len(names)))
+ for start in range(0, reps, block):
+  Xb = X[idx[start:start + block]]
+  Xb = Xb - Xb.mean(axis = 1, keepdims = True)
+  cov = np.einsum('bni,bnj->bij', Xb, Xb)
+  sd = np.sqrt(np.einsum('bii->bi', cov))
+  with np.errstate(divide = 'ignore', invalid = 'ignore'):
+   r[start:start + block] = cov/(sd[:, :, None]*sd[:, None, :])
+
+ #as in STEP 4, undefined correlations (constant columns) count as zero
+ r = np.nan_to_num(r, nan = 0.0)
+ se = r.std(axis = 0, ddof = 1) if reps > 1 else np.zeros(r.shape[1:])
+ return({k: float(se[col[a], col[b]]) for k, a, b in corrPairs})
+
+###############################
+#Define constraintDecompSym to compute node-level terms on an undirected (symmetric) graph
+###############################
+
+def constraintDecompSym(net):
+
+ ###############################
+ #STEP 1: Copy graph and compute volumes. Each tie counts once toward si, and output and
+ # input both equal si (as they would after doubling the tie into a DiGraph)
+ ###############################
+
+ net = net.copy()
+ tw = net.graph.get('triWedge')
+ if not triWedgeValid(tw, net):
+  tw = triangleWedgePass(net)
+  net.graph['triWedge'] = tw
+
+ adj = net.adj
+ conc = nx.get_node_attributes(net, 'conc')
+ s = {i: sum(d['weight'] for d in adj[i].values()) for i in net}
+ terms = {i: {'DD': 0.0, 'Ci': 0.0, 'TB': 0.0, 'ID': 0.0, 'IR': 0.0} for i in net}
+
+ ###############################
+ #STEP 2: Direct (Blau) elements
+ ###############################
+
+ for i in net:
+  net.nodes[i]['output'] = s[i]
+  net.nodes[i]['input'] = s[i]
+  ts = [d['weight']/s[i] for d in adj[i].values()]
+  terms[i]['DD'] = sum(math.pow(adj[i][j]['weight']/s[i], 2)*conc[j] for j in adj[i])
+
+  net.nodes[i]['degree'] = len(adj[i])
+  net.nodes[i]['varTS'] = float(0)
+  net.nodes[i]['sqAvgTS'] = float(0)
+  if net.nodes[i]['degree'] > 1 and net.graph['tsMethod'] != 'equal':
+   net.nodes[i]['varTS'] = np.var(ts)
+  net.nodes[i]['varEffect'] = net.nodes[i]['varTS']*net.nodes[i]['degree']
+  net.nodes[i]['sizeEffect'] = 1/max(net.nodes[i]['degree'], 1)
+  if net.nodes[i]['degree'] == 0:
+   terms[i]['Ci'] = float(1)
+
+ ###############################
+ #STEP 3: Indirect elements, once per undirected tie (i, j)
+ ###############################
+
+ for i, j, d in net.edges(data = True):
+
+  w = d['weight']
+  pij = w/s[i]
+  pji = w/s[j]
+  sharedAlters = tw['shared'][(i, j)]
+
+  #sum(wiq*wqj/sq) gives both aggIndirect(i, j) = Y/si and aggIndirect(j, i) = Y/sj
+  Y = 0.0
+  IDi = 0.0
+  IDj = 0.0
+  for q in sharedAlters:
+   wiq = adj[i][q]['weight']
+   wjq = adj[j][q]['weight']
+   Y += wiq*wjq/s[q]
+   IDi += math.pow(wjq/s[j], 2)*conc[q]
+   IDj += math.pow(wiq/s[i], 2)*conc[q]
+
+  #open quadriads: pairs (q, k) of shared alters that are not tied to each other
+  X = 0.0
+  for a in range(len(sharedAlters)):
+   q = sharedAlters[a]
+   aq = tw['nbrs'][q]
+   for k in sharedAlters[a + 1:]:
+    if k not in aq:
+     X += adj[i][q]['weight']*adj[i][k]['weight']*adj[q][j]['weight']*adj[k][j]['weight']/(s[q]*s[k])
+
+  aggIJ = Y/s[i]
+  aggJI = Y/s[j]
+  terms[i]['ID'] += math.pow(pij, 2)*IDi
+  terms[j]['ID'] += math.pow(pji, 2)*IDj
+  terms[i]['IR'] += 2*conc[j]*X/math.pow(s[i], 2)
+  terms[j]['IR'] += 2*conc[i]*X/math.pow(s[j], 2)
+  terms[i]['Ci'] += math.pow(pij + aggIJ, 2)*conc[j]
+  terms[j]['Ci'] += math.pow(pji + aggJI, 2)*conc[i]
+  terms[i]['TB'] += 2*pij*aggIJ*conc[j]
+  terms[j]['TB'] += 2*pji*aggJI*conc[i]
+
+ for i in net:
+  net.nodes[i].update(terms[i])
+  net.nodes[i]['QS'] = float(0)
+  net.nodes[i]['CC'] = net.nodes[i]['Ci'] - (net.nodes[i]['DD'] + net.nodes[i]['TB']  + net.nodes[i]['ID'] + net.nodes[i]['IR'])
+
+ return(net)
+
+###############################
+#Define constraintDecompEgos to compute constraint and its terms for a list of egos only
+###############################
+
+def constraintDecompEgos(net, egos):
+
+ ###############################
+ #STEP 1: Define local accessors that mirror constraintDecomp's STEP 1 without copying the
+ # graph: an i->j tie missing from a directed input is treated as weight 0, and alters are
+ # the union of successors and predecessors.
+ ###############################
+
+ directed = net.is_directed()
+ vol = {}
+ alters = {}
+
+ def weight(i, j):
+  if net.has_edge(i, j):
+   return(net.edges[i, j]['weight'])
+  return(0.0)
+
+ def altersOf(i):
+  if i not in alters:
+   if directed:
+    alters[i] = set(net.successors(i)) | set(net.predecessors(i))
+   else:
+    alters[i] = set(net[i])
+  return(alters[i])
+
+ def volume(i):
+  #(output, input) volume; only requested for egos and their alters
+  if i not in vol:
+   if directed:
+    vol[i] = (sum(d['weight'] for d in net.succ[i].values()), 
+     sum(d['weight'] for d in net.pred[i].values()))
+   else:
+    out = sum(d['weight'] for d in net[i].values())
+    vol[i] = (out, out)
+  return(vol[i])
+
+ def p(i, j):
+  return((weight(i, j) + weight(j, i))/sum(volume(i)))
+
+ ###############################
+ #STEP 2: Compute each ego's terms, following constraintDecomp's STEPS 2 and 3
+ ###############################
+
+ results = {}
+ for i in egos:
+
+  ai = altersOf(i)
+  pi = {j: p(i, j) for j in ai}
+  conc = {j: net.nodes[j]['conc'] for j in ai}
+  terms = {'output': volume(i)[0], 'input': volume(i)[1], 'degree': len(ai), 
+   'DD': float(0), 'varTS': float(0), 'sqAvgTS': float(0), 'Ci': float(0), 
+   'TB': float(0), 'ID': float(0), 'QS': float(0), 'IR': float(0), 'CC': float(0)}
+
+  #direct (Blau) elements
+  for j in ai:
+   terms['DD'] += math.pow(pi[j], 2)*conc[j]
+  if terms['degree'] > 1 and net.graph['tsMethod'] != 'equal':
+   terms['varTS'] = np.var(list(pi.values()))
+  terms['varEffect'] = terms['varTS']*terms['degree']
+  terms['sizeEffect'] = 1/max(terms['degree'], 1)
+  if terms['degree'] == 0:
+   terms['Ci'] = float(1)
+
+  #indirect elements, over (i, j, q) triples and (i, j, q, k) quads within i's neighborhood
+  for j in ai:
+   sharedAlters = list(ai & altersOf(j))
+   aggIndirect = 0.0
+   for q in sharedAlters:
+    aggIndirect += pi[q]*p(q, j)
+    terms['ID'] += pow(pi[j]*p(j, q), 2)*conc[q]
+    comp = [h for h in set(sharedAlters) - altersOf(q) if h > q]
+    for k in comp:
+     terms['IR'] += 2*conc[j]*pi[q]*pi[k]*p(q, j)*p(k, j)
+
+   terms['Ci'] += math.pow(pi[j] + aggIndirect, 2)*conc[j]
+   terms['TB'] += 2*pi[j]*aggIndirect*conc[j]
+
+  terms['CC'] = terms['Ci'] - (terms['DD'] + terms['TB'] + terms['ID'] + terms['IR'])
+  terms['C_net_size'] = terms['Ci'] - terms['sizeEffect']
+  terms['C_net_var'] = terms['Ci'] - terms['varEffect']
+  terms['C_net_DD'] = terms['Ci'] - terms['DD']
+
+  results[i] = terms
+
+ return(results)
@@ -0,0 +1,427 @@
+###############################
+#Name: constraintDecompService.py
+#Created by: XXX
+#Created: XXX
+#Desc: Program runs a long-lived local constraint decomposition service. A pool of pre-warmed
+# worker processes (networkx, pandas, and constraintDecomp already imported and exercised)
+# accepts edgelist + concentration payloads over HTTP, either on a TCP port or on a Unix
+# socket. Small concurrent requests are coalesced into batches so that each batch costs a
+# single round trip to a worker, with queued requests spread over all workers, and results
+# are kept in an LRU cache keyed by a content hash of the input. Latency percentiles and throughput are reported at /metrics.
+#Depends on:
+# constraintDecomp.py
+#Used by: the constraint web app (back-end), or any local client
+#Notes:
+# 1/ Request payload (POST /decomp) is JSON:
+#  {"edgelist": [[ego, alter, weight], ...], "conc": {node: concentration, ...},
+#   "symmetric": 0 or 1, "tsMethod": "equal" or other, "egos": [ego, ...]}
+#  weight is optional (defaults to 1.0), as are conc (defaults to 1.0 per node), symmetric
+#  (defaults to 0), and tsMethod (defaults to 'equal' if no weights are given).
+#  If egos is given, only those egos are scored (constraintDecompEgos), and the response
+#  carries no graph-level correlations, betweenness, or clustering.
+# 2/ Response is JSON: {"nodes": {node: {Ci, DD, TB, ID, IR, CC, ...}}, "graph": {corrs}}.
+#  Node ids come back as strings, because JSON object keys are strings.
+# 3/ Betweenness and clustering are computed on the undirected version of the input graph,
+#  as graphGen does, because constraintDecomp's correlations require them.
+# 4/ A batch runs serially inside one worker, so a burst is split into one batch per worker
+#  (at most maxBatch requests each) rather than filling one batch while other workers idle.
+# 5/ Malformed payloads (not an object, empty edgelist, edges without 2 or 3 entries or with
+#  non-scalar node ids, non-numeric weights or concentrations, a total tie weight that is not
+#  positive, non-scalar egos) are rejected with 400 before they reach a worker.
+# 6/ A request that waits longer than the timeout gets 504, and its key is dropped from the
+#  in-flight table, so a batch lost with a dead pool worker does not hold that key forever.
+#  Later requests for the same payload are resubmitted.
+# 7/ Example: python constraintDecompService.py --port 8765
+#             python constraintDecompService.py --socket /tmp/constraintDecomp.sock
+###############################
+
+###############################
+#STEP 0: Import modules/functions
+###############################
+
+import argparse
+import collections
+import hashlib
+import http.server
+import json
+import multiprocessing
+import os
+import socketserver
+import threading
+import time
+import concurrent.futures
+
+###############################
+#STEP 1: Worker-side functions
+# These run inside the pool's processes. Heavy imports happen once, in warmWorker.
+###############################
+
+nodeTerms = ['Ci', 'DD', 'TB', 'ID', 'IR', 'CC', 'QS', 'sizeEffect', 'varEffect', 'varTS',
+ 'sqAvgTS', 'degree', 'output', 'input', 'conc', 'betweenness', 'clustering']
+
+def warmWorker():
+
+ #import the heavy modules once per process, and run a tiny decomposition so that lazy
+  #imports and first-call overhead are paid before the first real request arrives
+ global nx, cD, cDEgos, triangleWedgePass
+ import networkx as nx
+ from graphTriangles import triangleWedgePass
+ import pandas
+ from constraintDecomp import constraintDecomp as cD
+ from constraintDecomp import constraintDecompEgos as cDEgos
+
+ decompPayload({'edgelist': [[0, 1], [1, 2], [2, 0], [2, 3]]})
+
+def buildNet(payload, metrics = True):
+
+ edges = payload['edgelist']
+ conc = payload.get('conc', {})
+ symmetric = int(payload.get('symmetric', 0))
+ weighted = any(len(e) > 2 for e in edges)
+
+ if symmetric == 1:
+  net = nx.Graph()
+ else:
+  net = nx.DiGraph()
+
+ for e in edges:
+  if len(e) > 2:
+   net.add_edge(e[0], e[1], weight = float(e[2]))
+  else:
+   net.add_edge(e[0], e[1], weight = 1.0)
+
+ #concentrations arrive keyed by string (JSON object keys), so match on str(node)
+ for i in net:
+  net.nodes[i]['conc'] = float(conc.get(str(i), 1.0))
+
+ net.graph['symmetric'] = symmetric
+ net.graph['tsMethod'] = payload.get('tsMethod', 'rand' if weighted else 'equal')
+
+ if not metrics:
+  return(net)
+
+ #node-level structural metrics, computed on the undirected graph (see graphGen). The
+  #triangle/wedge pass is kept on the graph for constraintDecomp to reuse
+ tw = triangleWedgePass(net)
+ net.graph['triWedge'] = tw
+ nx.set_node_attributes(net, name = 'clustering', values = tw['clustering'])
+ nx.set_node_attributes(net, name = 'betweenness', values = nx.betweenness_centrality(nx.Graph(net)))
+
+ return(net)
+
+def decompPayload(payload):
+
+ if payload.get('egos') is not None:
+  net = buildNet(payload, metrics = False)
+  #egos arrive as JSON values, so match them to node ids on str(node)
+  ids = {str(i): i for i in net}
+  egos = [ids[str(i)] for i in payload['egos'] if str(i) in ids]
+  terms = cDEgos(net, egos)
+  nodes = {str(i): {k: float(v) for k, v in terms[i].items()} for i in terms}
+  return({'nodes': nodes, 'graph': {}})
+
+ net = cD(buildNet(payload))
+
+ nodes = {}
+ for i in net:
+  nodes[str(i)] = {k: float(net.nodes[i][k]) for k in nodeTerms if k in net.nodes[i]}
+ graph = {k: float(v) for k, v in net.graph.items() 
+  if isinstance(v, (int, float)) and k != 'symmetric'}
+
+ return({'nodes': nodes, 'graph': graph})
+
+def decompBatch(payloads):
+
+ #one pool task per batch. errors are returned per payload so one bad request does not
+  #fail the rest of its batch
+ results = []
+ for payload in payloads:
+  try:
+   results.append((True, decompPayload(payload)))
+  except Exception as e:
+   results.append((False, '%s: %s' % (type(e).__name__, e)))
+ return(results)
+
+###############################
+#STEP 2: Service-side state
+# LRU result cache, latency/throughput metrics, and the batcher that feeds the pool.
+###############################
+
+def validatePayload(payload):
+
+ #raises ValueError on a payload shape buildNet cannot use (note 5)
+ if not isinstance(payload, dict):
+  raise ValueError('payload must be a JSON object')
+ edges = payload.get('edgelist')
+ if not isinstance(edges, list) or not edges:
+  raise ValueError('payload needs a non-empty edgelist')
+ for e in edges:
+  if not isinstance(e, list) or len(e) not in (2, 3) or \
+   not all(isinstance(i, (str, int, float)) for i in e[:2]):
+   raise ValueError('each edge must be [ego, alter] or [ego, alter, weight]: %s' % (e,))
+ #constraint divides by each node's total tie weight, so an all-zero graph cannot be scored
+ if sum(float(e[2]) if len(e) == 3 else 1.0 for e in edges) <= 0:
+  raise ValueError('total edge weight must be positive')
+ conc = payload.get('conc', {})
+ if not isinstance(conc, dict):
+  raise ValueError('conc must be an object of node: concentration')
+ for v in conc.values():
+  float(v)
+ egos = payload.get('egos')
+ if egos is not None and (not isinstance(egos, list) or
+  not all(isinstance(i, (str, int, float)) for i in egos)):
+  raise ValueError('egos must be a list of node ids')
+ int(payload.get('symmetric', 0))
+
+def payloadKey(payload):
+
+ #content hash of the canonical JSON form of the payload
+ body = json.dumps(payload, sort_keys = True, separators = (',', ':'))
+ return(hashlib.sha256(body.encode('utf-8')).hexdigest())
+
+class ResultCache:
+
+ def __init__(self, maxSize):
+  self.maxSize = maxSize
+  self.entries = collections.OrderedDict()
+  self.lock = threading.Lock()
+
+ def get(self, key):
+  with self.lock:
+   if key not in self.entries:
+    return(None)
+   self.entries.move_to_end(key)
+   return(self.entries[key])
+
+ def put(self, key, value):
+  if self.maxSize <= 0:
+   return
+  with self.lock:
+   self.entries[key] = value
+   self.entries.move_to_end(key)
+   while len(self.entries) > self.maxSize:
+    self.entries.popitem(last = False)
+
+class ServiceMetrics:
+
+ def __init__(self, window = 10000):
+  self.lock = threading.Lock()
+  self.startTime = time.time()
+  #(finish time, latency in seconds) of the most recent requests
+  self.recent = collections.deque(maxlen = window)
+  self.requests = 0
+  self.errors = 0
+  self.cacheHits = 0
+  self.batches = 0
+  self.batchedRequests = 0
+
+ def record(self, latency, hit = False, error = False):
+  with self.lock:
+   self.recent.append((time.time(), latency))
+   self.requests += 1
+   self.cacheHits += int(hit)
+   self.errors += int(error)
+
+ def recordBatch(self, size):
+  with self.lock:
+   self.batches += 1
+   self.batchedRequests += size
+
+ def summary(self):
+  with self.lock:
+   now = time.time()
+   lat = sorted(l for t, l in self.recent)
+   last60 = sum(1 for t, l in self.recent if now - t <= 60.0)
+   out = {'uptime_s': now - self.startTime, 'requests': self.requests, 'errors': self.errors,
+    'cacheHits': self.cacheHits, 'batches': self.batches,
+    'meanBatchSize': self.batchedRequests/max(self.batches, 1),
+    'throughput_rps': self.requests/max(now - self.startTime, 1e-9),
+    'throughput_rps_60s': last60/max(min(60.0, now - self.startTime), 1e-9), 'p50_ms': None, 'p99_ms': None}
+   if lat:
+    out['p50_ms'] = 1000*lat[min(len(lat) - 1, int(0.50*len(lat)))]
+    out['p99_ms'] = 1000*lat[min(len(lat) - 1, int(0.99*len(lat)))]
+   return(out)
+
+class RequestBatcher:
+
+ def __init__(self, pool, workers, cache, metrics, maxBatch, batchWindow):
+  self.pool = pool
+  self.workers = workers
+  self.cache = cache
+  self.metrics = metrics
+  self.maxBatch = maxBatch
+  self.batchWindow = batchWindow
+  self.queue = collections.deque()
+  self.cond = threading.Condition()
+  #requests with the same key that are already in flight share one future
+  self.inFlight = {}
+  threading.Thread(target = self.dispatch, daemon = True).start()
+
+ def submit(self, key, payload):
+  with self.cond:
+   if key in self.inFlight:
+    return(self.inFlight[key])
+   future = concurrent.futures.Future()
+   self.inFlight[key] = future
+   self.queue.append((key, payload, future))
+   self.cond.notify()
+   return(future)
+
+ def dispatch(self):
+
+  while True:
+   with self.cond:
+    while not self.queue:
+     self.cond.wait()
+    #wait up to batchWindow for more requests to arrive, unless every worker's batch is full
+    deadline = time.time() + self.batchWindow
+    while len(self.queue) < self.maxBatch*self.workers and time.time() < deadline:
+     self.cond.wait(deadline - time.time())
+    #split the queue evenly over the workers (note 4)
+    size = min(self.maxBatch, -(-len(self.queue)//self.workers))
+    batches = []
+    while self.queue and len(batches) < self.workers:
+     batches.append([self.queue.popleft() for b in range(min(size, len(self.queue)))])
+
+   for batch in batches:
+    self.metrics.recordBatch(len(batch))
+    self.pool.apply_async(decompBatch, ([p for k, p, f in batch],),
+     callback = lambda res, batch = batch: self.complete(batch, res),
+     error_callback = lambda e, batch = batch: self.complete(batch, [(False, str(e))]*len(batch)))
+
+ def complete(self, batch, results):
+
+  with self.cond:
+   for (key, payload, future), (ok, result) in zip(batch, results):
+    if ok:
+     self.cache.put(key, result)
+     future.set_result(result)
+    else:
+     future.set_exception(ValueError(result))
+    self.forget(key, future)
+
+ def forget(self, key, future):
+
+  #drop key from the in-flight table, unless a newer request has already replaced it
+  with self.cond:
+   if self.inFlight.get(key) is future:
+    del self.inFlight[key]
+
+###############################
+#STEP 3: HTTP front end
+###############################
+
+class DecompHandler(http.server.BaseHTTPRequestHandler):
+
+ protocol_version = 'HTTP/1.1'
+
+ def reply(self, code, body):
+  data = json.dumps(body).encode('utf-8')
+  self.send_response(code)
+  self.send_header('Content-Type', 'application/json')
+  self.send_header('Content-Length', str(len(data)))
+  self.end_headers()
+  self.wfile.write(data)
+
+ def do_GET(self):
+  if self.path == '/metrics':
+   self.reply(200, self.server.metrics.summary())
+  elif self.path == '/health':
+   self.reply(200, {'ok': True})
+  else:
+   self.reply(404, {'error': 'unknown path'})
+
+ def do_POST(self):
+
+  if self.path != '/decomp':
+   self.reply(404, {'error': 'unknown path'})
+   return
+
+  startTime = time.time()
+  try:
+   payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+   validatePayload(payload)
+  except (ValueError, TypeError) as e:
+   self.server.metrics.record(time.time() - startTime, error = True)
+   self.reply(400, {'error': str(e)})
+   return
+
+  key = payloadKey(payload)
+  result = self.server.cache.get(key)
+  hit = result is not None
+  try:
+   if not hit:
+    future = self.server.batcher.submit(key, payload)
+    result = future.result(self.server.requestTimeout)
+  except concurrent.futures.TimeoutError:
+   #the batch may have been lost with a pool worker, so resubmit next time (note 6)
+   self.server.batcher.forget(key, future)
+   self.server.metrics.record(time.time() - startTime, error = True)
+   self.reply(504, {'error': 'timed out after %s s' % self.server.requestTimeout})
+   return
+  except Exception as e:
+   self.server.metrics.record(time.time() - startTime, error = True)
+   self.reply(500, {'error': str(e)})
+   return
+
+  self.server.metrics.record(time.time() - startTime, hit = hit)
+  self.reply(200, result)
+
+ def log_message(self, format, *args):
+  #per-request logging would dominate latency for small graphs
+  pass
+
+class TCPDecompServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+ daemon_threads = True
+ request_queue_size = 128
+
+class UnixDecompServer(socketserver.ThreadingUnixStreamServer):
+ daemon_threads = True
+ request_queue_size = 128
+
+ def get_request(self):
+  #BaseHTTPRequestHandler expects a (host, port) client address
+  request, address = super().get_request()
+  return(request, ('unix', 0))
+
+def serve(port = 8765, socketPath = None, workers = None, maxBatch = 16, batchWindowMs = 2.0,
+ cacheSize = 1024, timeout = 300.0):
+
+ if workers is None:
+  workers = max(1, multiprocessing.cpu_count() - 1)
+
+ pool = multiprocessing.Pool(workers, initializer = warmWorker)
+ cache = ResultCache(cacheSize)
+ metrics = ServiceMetrics()
+
+ if socketPath:
+  if os.path.exists(socketPath):
+   os.remove(socketPath)
+  server = UnixDecompServer(socketPath, DecompHandler)
+ else:
+  server = TCPDecompServer(('127.0.0.1', port), DecompHandler)
+
+ server.cache = cache
+ server.metrics = metrics
+ server.requestTimeout = timeout
+ server.batcher = RequestBatcher(pool, workers, cache, metrics, maxBatch, batchWindowMs/1000.0)
+
+ print('constraintDecomp service listening on', socketPath or '127.0.0.1:%d' % port)
+ try:
+  server.serve_forever()
+ finally:
+  server.server_close()
+  pool.terminate()
+  if socketPath and os.path.exists(socketPath):
+   os.remove(socketPath)
+
+if __name__ == '__main__':
+ parser = argparse.ArgumentParser(description = 'Local constraint decomposition service')
+ parser.add_argument('--port', type = int, default = 8765)
+ parser.add_argument('--socket', default = None, help = 'serve on this Unix socket instead of TCP')
+ parser.add_argument('--workers', type = int, default = None)
+ parser.add_argument('--max-batch', type = int, default = 16)
+ parser.add_argument('--batch-window-ms', type = float, default = 2.0)
+ parser.add_argument('--cache-size', type = int, default = 1024)
+ args = parser.parse_args()
+ serve(args.port, args.socket, args.workers, args.max_batch, args.batch_window_ms, args.cache_size)
@@ -10,14 +10,36 @@
  #constraintSimParams.py (cSP)
  #graphGen.py
  #constraintDecomp.py
+ #simSchema.py
+ #resultPipeline.py
+ #canonicalCache.py
 #Used by: multiProcWrapper.py (cD)
 #Notes:
  #1/ Configurable parameters exist in constraintSimParams.py
  #2/ 'instance_num' is an integer associated with the core on which a given instance 
   #of constraintSim is running. At any time, (num_cores - 1) instances can be running.
-  #instance_num ensures that each sim_id is unique.
+  #instance_num ensures that each sim_id is unique. Instance i runs sim_ids
+  #firstId + i*numSimNets onward, where firstId is the first sim_id not yet in the DB
+  #(simSchema.prepareDB). multiProcWrapper reads it once and passes it to every instance.
+  #Instances started separately would each read a different firstId and overlap, so
+  #without a controller, instance_num > 0 requires firstId. A lone constraintSim() call
+  #(instance 0) reads it itself.
  #3 Limited random graph type to HZ and HK, since won't be using others.
  #4 Can avoid saving edgelist data to save time.
+ #5 Added swRepairs to graphSum. simSchema.createTables adds it (and any
+  #other new columns) to a graphSum table created before this change.
+ #6 If a controller (adaptiveStopping.py) is passed, it issues sim_ids and strata (netType,
+  #tsMethod, netSize range) until every stratum meets its target precision. A sim that
+  #fails before it is recorded is released back to the controller.
+ #7 If a sink spec (resultPipeline.py) is passed, finished rows go to shared-memory rings that
+  #a single writer process drains, and this instance opens no DB connection.
+ #8 cSP.bootstrapReps > 0 adds bootstrap standard errors (graphSum '_se' columns) for the
+  #per-graph correlations; otherwise those columns are NULL.
+ #9 Each graphSum row is also added to the stratumSum summary table (simSchema.py), and
+  #cSP.sqlitePath switches the DB to a local SQLite file.
+ #10 With cSP.canonicalCache = 1, each generated graph is first looked up in a cache of
+  #isomorphic weighted graphs (canonicalCache.py). A hit skips graphMetrics and cD, and is
+  #recorded as graphSum cacheHit = 1. Each instance prints its hit rates by netType and size.
 ###############################
 
 ###############################
@@ -33,70 +55,83 @@ import numpy as np
 import scipy as sp
 import decimal
 import datetime
-import pyodbc
 import pandas as pd
 
-from graphGen import graphGen
+import simSchema
+from graphGen import graphGen, graphMetrics
 from constraintDecomp import constraintDecomp as cD
+from resultPipeline import ResultSink
+from canonicalCache import CanonicalCache
 
 #delete after testing
 #instance_num = 0
 
 ###############################
-#Define constraintSim as while loop
+#Define constraintSim to run simSims, releasing an unfinished controller sim on failure
 ###############################
 
-def constraintSim(instance_num = 0):
-
- ###############################
- #STEP 0: Establish ODBC connection and ensure DB tables exist
- ###############################
+def constraintSim(instance_num = 0, controller = None, sink = None, firstId = None):
 
+ #issued['stratum'] holds the stratum of a sim taken from the controller but not yet
+  #recorded. If simSims fails, give that sim back so the stratum is not left waiting on it
+ if firstId is None and controller is None and instance_num > 0:
+  raise ValueError('instance_num > 0 needs the firstId shared by all instances (note 2)')
+ issued = {'stratum': None}
+ try:
+  simSims(instance_num, controller, sink, issued, firstId)
+ finally:
+  if issued['stratum'] is not None:
+   controller.release(issued['stratum'])
 
- #Specify connection
- cnxn = pyodbc.connect("DSN=ConstraintSim")
+###############################
+#Define simSims as while loop
+###############################
 
- c = cnxn.cursor()
+def simSims(instance_num, controller, sink, issued, firstId):
 
- #Create tables in which to store graph, ego, and edge output
- c.execute ('''if not exists (select 1 from INFORMATION_SCHEMA.TABLES where TABLE_NAME ='graphSum') 
-  create table graphSum (sim_id int, runTime real, netType nvarchar(16), rewireP real, netSize int, 
-  densTarget real, densActual real, avgCC real, transitivity real, walkLen int,
-  cc real, linkAdd int, avgDegree real, pTF real, tsMethod nvarchar(16), tsExp real, symmetric int,
+ ###############################
+ #STEP 0: Establish ODBC connection and ensure DB tables exist
+ ###############################
 
-  Ci_DD real, Ci_sizeEffect real, Ci_varEffect real, Ci_ID real, Ci_TB real,
-  Ci_QS real, Ci_OQD real, Ci_CQD real, Ci_betweenness real, Ci_clustering real,
-  Ci_degree real, DD_sizeEffect real, DD_varEffect real, DD_ID real, DD_TB real,
-  DD_QS real, DD_OQD real, DD_CQD real, DD_betweenness real, DD_clustering real,
-  DD_degree real, sizeEffect_varEffect real, sizeEffect_ID real, sizeEffect_TB real,
-  sizeEffect_QS real, sizeEffect_OQD real, sizeEffect_CQD real, sizeEffect_betweenness real,
-  sizeEffect_clustering real, sizeEffect_degree real, varEffect_ID real, varEffect_TB real,
-  varEffect_QS real, varEffect_OQD real, varEffect_CQD real, varEffect_betweenness real,
-  varEffect_clustering real, varEffect_degree real, ID_TB real, ID_QS real, 
-  ID_OQD real, ID_CQD real, ID_betweenness real, ID_clustering real, ID_degree real,
-  TB_QS real, TB_OQD real, TB_CQD real, TB_betweenness real, TB_clustering real,
-  TB_degree real, QS_OQD real, QS_CQD real, QS_betweenness real, QS_clustering real,
-  QS_degree real, OQD_CQD real, OQD_betweenness real, OQD_clustering real, 
-  OQD_degree real, CQD_betweenness real, CQD_clustering real, CQD_degree real,
-  betweenness_clustering real, betweenness_degree real, clustering_degree real,
-  betweenness_C_net_size real, betweenness_C_net_var real, betweenness_C_net_DD real,
-  clustering_C_net_size real, clustering_C_net_var real, clustering_C_net_DD real
 
-  )''')
+ #Specify connection, unless a single-writer sink (resultPipeline.py) is handling the DB
+ if sink is None:
+  cnxn = simSchema.connect()
 
- c.execute ('''if not exists (select 1 from INFORMATION_SCHEMA.TABLES where TABLE_NAME ='ego_time') 
-  create table ego_time (sim_id int, time_id int, ego_id int, concentration real NULL, 
-  output real, input real, degCent int, Ci real, DD real, varTS real, sqAvgTS real, TD real, 
-  ID real, CQD real, OQD real, betweenness real, clustering real, sizeEffect real, varEffect real)''')
+  c = cnxn.cursor()
 
- c.execute ('''if not exists (select 1 from INFORMATION_SCHEMA.TABLES where TABLE_NAME ='edgelist_time') 
-  create table edgelist_time (sim_id int, time_id int, ego_id int, alter_id int, tieStrength real, pij real,
-  frequency int, aggIndirect real)''')
+  #Create tables in which to store graph, ego, and edge output (see simSchema.py)
+  simSchema.createTables(c)
 
- cnxn.commit()
+  cnxn.commit()
 
- sim_id = instance_num*cSP.numSimNets
- while sim_id < cSP.numSimNets*(instance_num + 1):
+  #continue sim_ids from the DB unless the caller already did (see note 2)
+  if firstId is None:
+   firstId = simSchema.nextSimId(c)
+ else:
+  sink = ResultSink(sink)
+  if firstId is None:
+   firstId = simSchema.prepareDB()
+
+ #result cache for repeated small topologies
+ cache = None
+ if cSP.canonicalCache == 1:
+  cache = CanonicalCache(cSP.canonicalCacheMaxSize, cSP.canonicalCacheQuantum,
+   cSP.canonicalCacheFile, cSP.canonicalCacheMaxNetSize)
+
+ sim_id = firstId + instance_num*cSP.numSimNets
+ stratum = None
+ while True:
+
+  #with an adaptive stopping controller, ask it for the next sim_id and stratum. Otherwise,
+   #run this instance's fixed block of numSimNets sims
+  if controller is not None:
+   sim_id, stratum = controller.nextSim()
+   if sim_id is None:
+    break
+   issued['stratum'] = stratum
+  elif sim_id >= firstId + cSP.numSimNets*(instance_num + 1):
+   break
 
   startTime = datetime.datetime.now()
 
@@ -104,8 +139,11 @@ def constraintSim(instance_num = 0):
   #STEP 1: Generate random network from randomized parameters
   ###############################
 
-  #generate random network parameters
-  netSize = random.randint(cSP.minNetSize, cSP.maxNetSize)
+  #generate random network parameters. A controller stratum fixes the netSize range
+  if stratum is not None:
+   netSize = random.randint(stratum[2], stratum[3])
+  else:
+   netSize = random.randint(cSP.minNetSize, cSP.maxNetSize)
   netDensity = random.uniform(cSP.minDensity, cSP.maxDensity)
   rewireP = random.uniform(cSP.minRewireP, cSP.maxRewireP)
   #Force density such that average degree >= 2
@@ -124,12 +162,15 @@ def constraintSim(instance_num = 0):
   #netType = random.choice(['HK', 'HZ'])
   tsMethod = random.choice(['equal', 'freq', 'freqExp', 'rand', 'randExp', 'revRandExp'])
   symmetric = random.choice([0, 1])
+  if stratum is not None:
+   netType = stratum[0]
+   tsMethod = stratum[1]
 
   print('initialized graph params')
 
-  #call function to generate network
+  #call function to generate network. With the cache, metrics wait until after the lookup
   net = graphGen([netType, rewireP, netSize, netDensity, walkLen, cc, 
-   linkAdd, avgDegree, cSP.pTF, tsMethod, cSP.tsExponent, symmetric])
+   linkAdd, avgDegree, cSP.pTF, tsMethod, cSP.tsExponent, symmetric], metrics = cache is None)
 
   print('created graph')    
     
@@ -137,8 +178,14 @@ def constraintSim(instance_num = 0):
   #STEP 2: Decompose constraint for random net and compute correlations on returned parameters.
   ###############################
   
-  #call function to process net and decompose constraint
-  net = cD(net)
+  #call function to process net and decompose constraint, unless an isomorphic graph's
+   #results are cached
+  if cache is None:
+   net = cD(net, cSP.bootstrapReps)
+  elif not cache.lookup(net):
+   graphMetrics(net)
+   net = cD(net, cSP.bootstrapReps)
+   cache.store(net)
 
   print('decomposed graph')
   ###############################
@@ -146,14 +193,12 @@ def constraintSim(instance_num = 0):
   ###############################
 
   #Write ego data
-  for i in net:
-   cur_values = (sim_id, 1, i, net.node[i]['conc'], net.node[i]['output'], net.node[i]['input'], 
-    net.node[i]['degree'], net.node[i]['Ci'], net.node[i]['DD'], net.node[i]['varTS'], net.node[i]['sqAvgTS'],
-    net.node[i]['TB'], net.node[i]['ID'], net.node[i]['CC'], net.node[i]['IR'], net.node[i]['betweenness'], 
-    net.node[i]['clustering'], net.node[i]['sizeEffect'], net.node[i]['varEffect']) 
-   #print (cur_values)
-   c.execute('INSERT INTO ego_time VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', cur_values)
-   cnxn.commit()
+  egoRows = simSchema.egoTimeRows(sim_id, net)
+  if sink is None:
+   for cur_values in egoRows:
+    #print (cur_values)
+    c.execute(simSchema.insertSQL('ego_time'), cur_values)
+    cnxn.commit()
 
   #Write edgelist data
   #for i in net.node:  
@@ -169,36 +214,25 @@ def constraintSim(instance_num = 0):
   et = endTime - startTime
 
   #Write Graph data
-  cur_values = (sim_id, et.total_seconds(), net.graph['netType'], net.graph['rewireP'], net.graph['netSize'], 
-   net.graph['netDensity'], nx.density(net), net.graph['avgCC'], net.graph['transitivity'], 
-   net.graph['walkLen'], net.graph['cc'], net.graph['linkAdd'], 
-   net.graph['avgDegree'], net.graph['pTF'], net.graph['tsMethod'], net.graph['tsExp'], net.graph['symmetric'],
-   net.graph['Ci_DD'], net.graph['Ci_sizeEffect'], net.graph['Ci_varEffect'], net.graph['Ci_ID'], net.graph['Ci_TB'],
-   net.graph['Ci_QS'], net.graph['Ci_OQD'], net.graph['Ci_CQD'], net.graph['Ci_betweenness'], net.graph['Ci_clustering'],
-   net.graph['Ci_degree'], net.graph['DD_sizeEffect'], net.graph['DD_varEffect'], net.graph['DD_ID'], net.graph['DD_TB'],
-   net.graph['DD_QS'], net.graph['DD_OQD'], net.graph['DD_CQD'], net.graph['DD_betweenness'], net.graph['DD_clustering'],
-   net.graph['DD_degree'], net.graph['sizeEffect_varEffect'], net.graph['sizeEffect_ID'], net.graph['sizeEffect_TB'],
-   net.graph['sizeEffect_QS'], net.graph['sizeEffect_OQD'], net.graph['sizeEffect_CQD'], net.graph['sizeEffect_betweenness'],
-   net.graph['sizeEffect_clustering'], net.graph['sizeEffect_degree'], net.graph['varEffect_ID'], net.graph['varEffect_TB'],
-   net.graph['varEffect_QS'], net.graph['varEffect_OQD'], net.graph['varEffect_CQD'], net.graph['varEffect_betweenness'],
-   net.graph['varEffect_clustering'], net.graph['varEffect_degree'], net.graph['ID_TB'], net.graph['ID_QS'], 
-   net.graph['ID_OQD'], net.graph['ID_CQD'], net.graph['ID_betweenness'], net.graph['ID_clustering'], net.graph['ID_degree'],
-   net.graph['TB_QS'], net.graph['TB_OQD'], net.graph['TB_CQD'], net.graph['TB_betweenness'], net.graph['TB_clustering'],
-   net.graph['TB_degree'], net.graph['QS_OQD'], net.graph['QS_CQD'], net.graph['QS_betweenness'], net.graph['QS_clustering'],
-   net.graph['QS_degree'], net.graph['OQD_CQD'], net.graph['OQD_betweenness'], net.graph['OQD_clustering'], 
-   net.graph['OQD_degree'], net.graph['CQD_betweenness'], net.graph['CQD_clustering'], net.graph['CQD_degree'],
-   net.graph['betweenness_clustering'], net.graph['betweenness_degree'], net.graph['clustering_degree'],
-   net.graph['betweenness_C_net_size'], net.graph['betweenness_C_net_var'], net.graph['betweenness_C_net_DD'],
-   net.graph['clustering_C_net_size'], net.graph['clustering_C_net_var'], net.graph['clustering_C_net_DD'],)
+  cur_values = simSchema.graphSumRow(sim_id, et.total_seconds(), net)
  
   #print (cur_values)
 
-  c.execute('INSERT INTO graphSum VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', cur_values)
+  if sink is None:
+   c.execute(simSchema.insertSQL('graphSum'), cur_values)
+   simSchema.updateStratumSum(c, [cur_values])
 
-  cnxn.commit()
+   cnxn.commit()
+  else:
+   sink.put(cur_values, egoRows)
   
   print('inserted data into DB')
 
+  #report the finished sim's target correlations to the controller
+  if controller is not None:
+   controller.record(stratum, {k: net.graph[k] for k in cSP.adaptiveTargets})
+   issued['stratum'] = None
+
   ############################## 
   # round(decimal.Decimal(nx.average_clustering(net)),2), 
   # "trans is: ", round(decimal.Decimal(nx.transitivity(net)),2), 
@@ -210,4 +244,13 @@ def constraintSim(instance_num = 0):
   #Generate new simulation parameters
   imp.reload(cSP)
 
+ #tell the writer this instance is done
+ if sink is not None:
+  sink.close()
+
+ #report cache hit rates and keep the cache for later runs
+ if cache is not None:
+  cache.report()
+  cache.save()
+
 
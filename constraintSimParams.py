@@ -11,6 +11,14 @@
   #in total (using math.floor to ensure no overlapping sim IDs).
  #3/ Based on Strat. Sci. reviewer comments, simulating small networks, as these tend to correspond to the examples people offer of where 
  #      constriant is perceived as working correctly. Adjusted min/max NetSize to simulate small nets.
+ #4/ adaptive* parameters configure the adaptive stopping controller (adaptiveStopping.py). With
+ #      adaptiveStopping = 1, sims are allocated across netType x tsMethod x netSize-bin strata
+ #      until each target correlation's CI half-width is met, and numSimNets is ignored.
+ #      The netSize bins split [minNetSize, maxNetSize] into adaptiveNumSizeBins ranges.
+ #5/ singleWriter = 1 routes results through shared-memory rings to one writer process
+ #      (resultPipeline.py), so only that process connects to the DB.
+ #6/ canonicalCache = 1 reuses the results of earlier isomorphic graphs with the same tie strengths
+ #      (canonicalCache.py). Mostly useful for small nets with tsMethod 'equal'.
 ###############################
 
 import random
@@ -32,4 +40,37 @@ max1StepP = 1.0 #used to generate cc in HZ model
 minRewireP = 0.0 #used in assign P in SW model
 maxRewireP = 0.5 #used in assign P in SW model
 pTF = random.uniform(0.0, 0.30) #HK paper seems to have used 0.15. 
-tsExponent = 2.0 #exponent applied to tie strengths in relevant tsMethod routines
\ No newline at end of file
+tsExponent = 2.0 #exponent applied to tie strengths in relevant tsMethod routines
+fastGenMinSize = 1000 #ER, BA, SW, and HK nets at least this large use graphGenFast generators
+bootstrapReps = 0 #bootstrap resamples for per-graph correlation standard errors (0 = off)
+
+#Adaptive stopping controller (see adaptiveStopping.py)
+adaptiveStopping = 0 #1 = allocate sims by stratum until target precision is met
+adaptiveTargets = {'Ci_DD': 0.02, 'Ci_TB': 0.02, 'Ci_sizeEffect': 0.02} #CI half-widths (r scale)
+adaptiveConfidence = 0.95
+adaptiveMinSims = 30 #finished sims per stratum before its CI is trusted
+adaptiveMaxSims = 100000 #campaign-wide cap on issued sims
+adaptiveStartId = 0 #lowest first sim_id issued; ids always start past those already in the DB
+adaptiveNetTypes = ['ER', 'BA', 'SW', 'HK', 'HZ']
+adaptiveTsMethods = ['equal', 'freq', 'freqExp', 'rand', 'randExp', 'revRandExp']
+adaptiveNumSizeBins = 3 #netSize bins, splitting [minNetSize, maxNetSize] as evenly as possible
+adaptiveSizeBins = [(minNetSize + b*(maxNetSize - minNetSize + 1)//adaptiveNumSizeBins,
+ minNetSize + (b + 1)*(maxNetSize - minNetSize + 1)//adaptiveNumSizeBins - 1)
+ for b in range(adaptiveNumSizeBins)] #inclusive netSize ranges
+
+#Single-writer result pipeline (see resultPipeline.py)
+singleWriter = 0 #1 = workers hand rows to one DB writer process instead of connecting themselves
+ringGraphCapacity = 1024 #graphSum rows per worker ring
+ringEgoCapacity = 65536 #ego_time rows per worker ring
+writerBatchSize = 5000 #rows per executemany call
+writerPollInterval = 0.05 #seconds the writer sleeps when every ring is empty
+
+#Output DB (see simSchema.py)
+sqlitePath = None #path to a local SQLite file to write to instead of the ConstraintSim ODBC DSN
+
+#Canonical-graph result cache (see canonicalCache.py)
+canonicalCache = 0 #1 = reuse results of isomorphic graphs with equal weights and concentrations
+canonicalCacheMaxSize = 10000 #cached graphs per instance (least recently used are evicted)
+canonicalCacheMaxNetSize = 30 #larger graphs are neither looked up nor stored
+canonicalCacheQuantum = 1e-9 #weights and concentrations are compared after rounding to this
+canonicalCacheFile = None #pickle file the cache is loaded from and saved to (None = memory only)
\ No newline at end of file
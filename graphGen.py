@@ -10,17 +10,27 @@
 #Depends on: 
  #constraintSimParams.py
  #graphGenHerreraZufiria.py
+ #graphGenFast.py
+ #graphTriangles.py
 #Used by: constraintSim.py
 #Notes:
  #1/ Configurable parameters exist in constraintSimParams.py
- #2/ SW networks may not be connected, so using connected_small_world. This repeatedly executes
-  #SW until a connected graph occurs or a max number of iterations passes. Thus, it may still
-  #yield a disconnected graph. If an isolate occurs, and if the isolate is chosen in the random
-  #walk, this can yield an error.
+ #2/ SW networks may not be connected. Formerly used connected_small_world, which repeatedly
+  #executes SW until a connected graph occurs or a max number of iterations passes (and so
+  #could still yield a disconnected graph). Now using graphGenFast.connectedWS, which repairs
+  #connectivity locally by re-rewiring ties instead of regenerating. Repairs are stored as
+  #swRepairs (0 for other netTypes).
  #3/ Added an "if" clause to random walk to avoid (2)
  #4/ May want to make random walk a separate function, and only call if using 'freq'-dependent
   #tie strength method.
  #5/ Added concentration attribute when computing tie strength (because already in that loop)
+ #6/ For netSize >= cSP.fastGenMinSize, ER, BA, and HK topologies come from the array-based
+  #generators in graphGenFast.py, which avoid networkx's O(n^2) ER pair loop and its
+  #node-by-node dict growth. SW always uses graphGenFast (see 2).
+ #7/ Clustering and betweenness are computed by graphMetrics after tie strengths are set, on the
+  #undirected ties. graphGen(input, metrics = False) leaves them out, so constraintSim can
+  #look the weighted graph up in the canonical cache (canonicalCache.py) first. cacheHit is
+  #set to 1 by the cache on a hit.
 ###############################
 
 ###############################
@@ -31,14 +41,30 @@ import math
 import random
 import networkx as nx
 import decimal
+import constraintSimParams as cSP
 
 from graphGenHerreraZufiria import graphGenHerreraZufiria as genHZ
+import graphGenFast as gGF
+from graphTriangles import triangleWedgePass
+
+###############################
+#Define fastGraphGen to generate a large ER, BA, SW, or HK topology from edge arrays
+###############################
+
+def fastGraphGen(netType, netSize, netDensity, linkAdd, pTF):
+
+ if netType == 'ER':
+  return(gGF.edgesToGraph(netSize, gGF.fastER(netSize, netDensity)))
+ elif netType == 'BA':
+  return(gGF.edgesToGraph(netSize, gGF.fastBA(netSize, linkAdd)))
+ else:
+  return(gGF.edgesToGraph(netSize, gGF.fastHK(netSize, linkAdd, pTF)))
 
 ###############################
 #Define graphGen to generate 1 random graph using constraintSim parameters
 ###############################
 
-def graphGen(input):
+def graphGen(input, metrics = True):
 
  netType = input[0]
  rewireP = input[1]
@@ -53,16 +79,18 @@ def graphGen(input):
  tsExp = input[10]
  symmetric = input[11]
   
- #Generate random network
- if netType == 'ER':
+ #Generate random network. Large networks use the array-based generators
+ swRepairs = 0
+ if netSize >= cSP.fastGenMinSize and netType in ['ER', 'BA', 'HK']:
+  net = fastGraphGen(netType, netSize, netDensity, int(linkAdd), pTF)
+ elif netType == 'ER':
   net = nx.erdos_renyi_graph(netSize, netDensity)
  elif netType == 'BA':
   net = nx.barabasi_albert_graph(netSize, int(linkAdd), seed=None)
- #used connected SW to avoid isolates in subsequent frequency random walks. To
-  #reduce number of cases where isolates can occur, increased tries from default (100)
-  #to 1000.
+ #used connected SW to avoid isolates in subsequent frequency random walks. connectedWS
+  #repairs disconnected rewirings locally rather than regenerating the graph (see note 2)
  elif netType == 'SW':
-  net = nx.connected_watts_strogatz_graph(netSize, int(avgDegree), rewireP, 1000)
+  net, swRepairs = gGF.connectedWS(netSize, int(avgDegree), rewireP)
  elif netType == 'HK':
   net = nx.powerlaw_cluster_graph(netSize, int(linkAdd), pTF)
  else:
@@ -81,6 +109,8 @@ def graphGen(input):
  net.graph['tsMethod'] = input[9]
  net.graph['tsExp'] = input[10]
  net.graph['symmetric'] = input[11]
+ net.graph['swRepairs'] = swRepairs
+ net.graph['cacheHit'] = 0
 
  #For non-HZ methods, create freq attribute and use random walks to populate (only necessary 
   #to influence tie strength). HZ networks already have this attribute.
@@ -114,17 +144,6 @@ def graphGen(input):
    #increment population counter
    walks += 1
 
- #Calculate some graph properties.
- net.graph['avgCC'] = float(decimal.Decimal(nx.average_clustering(net)))
- net.graph['transitivity'] = float(decimal.Decimal(nx.transitivity(net)))
-
- #add node-level attributes: betweenness and clustering coefficient. Have to do this before
-  #setting graph to diGraph.
- cl = nx.clustering(net)
- bet = nx.betweenness_centrality(net)
- nx.set_node_attributes(net, name = 'clustering', values = cl)
- nx.set_node_attributes(net, name = 'betweenness', values = bet)
-
  #set to diGraph if net is supposed to be asymmetric. This will allow asymmetric tie weights
   #in the subsequent step.
  if symmetric == 0:
@@ -149,5 +168,35 @@ def graphGen(input):
    elif tsMethod == 'revRandExp':
     net.edges[i, j]['weight'] = math.pow(1-random.uniform(0, 1), tsExp)
 
+ #graph and node metrics, unless the caller first checks the canonical cache (see note 7)
+ if metrics:
+  graphMetrics(net)
+
  #return graph
- return(net)
\ No newline at end of file
+ return(net)
+
+###############################
+#Define graphMetrics to add clustering and betweenness to a generated graph
+###############################
+
+def graphMetrics(net):
+
+ #Calculate some graph properties. One triangle/wedge pass gives average clustering,
+  #transitivity, and node clustering, and is kept on the graph so constraintDecomp can
+  #reuse its shared-alter lists. The pass treats a DiGraph's ties as undirected.
+ tw = triangleWedgePass(net)
+ net.graph['triWedge'] = tw
+ net.graph['avgCC'] = float(decimal.Decimal(tw['avgCC']))
+ net.graph['transitivity'] = float(decimal.Decimal(tw['transitivity']))
+
+ #add node-level attributes: betweenness and clustering coefficient, both on the undirected
+  #graph
+ cl = tw['clustering']
+ if net.is_directed():
+  bet = nx.betweenness_centrality(nx.Graph(net))
+ else:
+  bet = nx.betweenness_centrality(net)
+ nx.set_node_attributes(net, name = 'clustering', values = cl)
+ nx.set_node_attributes(net, name = 'betweenness', values = bet)
+
+ return(net)
\ No newline at end of file
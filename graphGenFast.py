@@ -0,0 +1,270 @@
+###############################
+#Name: graphGenFast.py
+#Created by: XXX
+#Created: XXX
+#Desc: Program implements large-n generator backends for graphGen. Each generator returns an
+# (E x 2) numpy array of undirected edges over nodes 0..n-1 instead of growing a networkx
+# graph node by node. edgesToGraph builds the networkx graph graphGen needs.
+#Depends on:
+#Used by: graphGen.py
+#Notes:
+# 1/ ER uses geometric skipping over the n(n-1)/2 candidate pairs (Batagelj and Brandes, 2005),
+#  vectorized with numpy, so cost is O(n + m) instead of networkx's O(n^2) pair loop.
+# 2/ BA and HK follow networkx 2.2's barabasi_albert_graph and powerlaw_cluster_graph step for
+#  step (m initial isolates, repeated-nodes preferential attachment, HK triad formation), but
+#  keep the repeated nodes in a preallocated array, so degree and clustering statistics
+#  match the networkx versions.
+# 3/ WS follows networkx's watts_strogatz_graph (ring lattice, then rewire each lattice edge
+#  with probability p, avoiding self-loops and duplicate edges). It does not guarantee a
+#  connected graph. connectedWS adds that guarantee by repairing the rewired graph locally:
+#  while there is more than one component, one non-bridge tie of a node t outside the
+#  smallest component is re-rewired to a node s inside it (or, if t has no non-bridge tie,
+#  any non-bridge tie is moved to (s, t)). Removing a non-bridge tie never splits a
+#  component, so each repair merges two components and keeps the edge count. This replaces
+#  connected_watts_strogatz_graph's regenerate-from-scratch loop. With k >= 2 there are at
+#  least n ties, so a graph with more than one component always has a cycle, hence a
+#  non-bridge tie, and one lattice generation always suffices.
+# 5/ repairConnectivity finds components once and merges them as it repairs. A tie of t is
+#  tested for being a bridge only when it is considered, by a bidirectional search between
+#  its ends with the tie hidden. That search stops once either side runs out, so its cost is
+#  bounded by the smaller side rather than by the whole graph. When t has no non-bridge tie,
+#  a tie is taken from the first cycle a depth-first search finds in the smallest component
+#  that has one (every tie on a cycle is a non-bridge), instead of listing all bridges.
+# 4/ Draws use numpy's global generator for the vectorized ER skips and Python's random
+#  module elsewhere, as graphGen does.
+###############################
+
+###############################
+#STEP 0: Import modules/functions
+###############################
+
+import heapq
+import math
+import random
+import numpy as np
+import networkx as nx
+
+###############################
+#STEP 1: Erdos Renyi G(n, p) via geometric skipping
+###############################
+
+def fastER(n, p):
+
+ numPairs = n*(n - 1)//2
+ if n < 2 or p <= 0:
+  return(np.zeros((0, 2), dtype = np.int64))
+ if p >= 1:
+  idx = np.arange(numPairs, dtype = np.int64)
+ else:
+  #draw geometric gaps between selected pairs in chunks sized to cover the expected edge
+   #count; positions are 0-based linear indices into the lower triangle
+  chunks = []
+  last = -1
+  chunkSize = int(numPairs*p + 10*math.sqrt(numPairs*p) + 100)
+  while last < numPairs:
+   pos = last + np.cumsum(np.random.geometric(p, chunkSize).astype(np.int64))
+   chunks.append(pos)
+   last = int(pos[-1])
+  idx = np.concatenate(chunks)
+  idx = idx[idx < numPairs]
+
+ #map linear index k to lower-triangle pair (v, w), with w < v and k = v(v-1)/2 + w
+ v = ((1 + np.sqrt(1 + 8*idx.astype(np.float64)))/2).astype(np.int64)
+ #correct float rounding at triangle boundaries
+ v -= (v*(v - 1)//2 > idx)
+ v += ((v + 1)*v//2 <= idx)
+ w = idx - v*(v - 1)//2
+
+ return(np.column_stack((v, w)))
+
+###############################
+#STEP 2: Preferential attachment helpers and the BA and HK generators
+###############################
+
+def randomSubset(repeated, fill, m):
+
+ #m distinct nodes drawn from the first fill entries of the repeated-nodes array
+ targets = set()
+ while len(targets) < m:
+  targets.add(int(repeated[int(random.random()*fill)]))
+ return(targets)
+
+def fastBA(n, m):
+
+ if m < 1 or m >= n:
+  raise ValueError('BA requires 1 <= m < n (m = %s, n = %s)' % (m, n))
+
+ edges = np.empty(((n - m)*m, 2), dtype = np.int64)
+ repeated = np.empty(2*(n - m)*m, dtype = np.int64)
+ fill = 0
+ e = 0
+ targets = list(range(m))
+ for source in range(m, n):
+  edges[e:e + m, 0] = source
+  edges[e:e + m, 1] = targets
+  e += m
+  repeated[fill:fill + m] = targets
+  repeated[fill + m:fill + 2*m] = source
+  fill += 2*m
+  if source < n - 1:
+   targets = list(randomSubset(repeated, fill, m))
+
+ return(edges)
+
+def fastHK(n, m, pTF):
+
+ if m < 1 or m > n:
+  raise ValueError('HK requires 1 <= m <= n (m = %s, n = %s)' % (m, n))
+
+ #neighbor lists are needed for triad formation; repeated nodes live in a flat array
+ adj = [[] for i in range(n)]
+ edges = np.empty(((n - m)*m, 2), dtype = np.int64)
+ repeated = np.empty(m + 2*(n - m)*m, dtype = np.int64)
+ repeated[:m] = np.arange(m)
+ fill = m
+ e = 0
+
+ def addEdge(u, v):
+  nonlocal e, fill
+  #networkx ignores duplicate edges, but still appends v to the repeated nodes
+  if v not in adj[u]:
+   adj[u].append(v)
+   adj[v].append(u)
+   edges[e] = (u, v)
+   e += 1
+  repeated[fill] = v
+  fill += 1
+
+ for source in range(m, n):
+  possible = randomSubset(repeated, fill, m)
+  target = possible.pop()
+  addEdge(source, target)
+  count = 1
+  while count < m:
+   if random.random() < pTF:
+    nbrs = adj[source]
+    neighborhood = [k for k in adj[target] if k not in nbrs and k != source]
+    if neighborhood:
+     addEdge(source, random.choice(neighborhood))
+     count += 1
+     continue
+   target = possible.pop()
+   addEdge(source, target)
+   count += 1
+  repeated[fill:fill + m] = source
+  fill += m
+
+ return(edges[:e])
+
+###############################
+#STEP 3: Watts Strogatz ring lattice with rewiring
+###############################
+
+def fastWS(n, k, p):
+
+ half = k//2
+ if half < 1 or k >= n:
+  raise ValueError('WS requires 2 <= k < n (k = %s, n = %s)' % (k, n))
+
+ #lattice edges (u, u + j mod n), ordered as networkx visits them during rewiring
+ u = np.tile(np.arange(n, dtype = np.int64), half)
+ v = (u + np.repeat(np.arange(1, half + 1, dtype = np.int64), n)) % n
+ edges = np.column_stack((u, v))
+ rewire = np.flatnonzero(np.random.random(len(edges)) < p)
+
+ #edge keys for duplicate checks, and degrees to detect saturated nodes
+ present = set((np.minimum(u, v)*n + np.maximum(u, v)).tolist())
+ degree = np.full(n, 2*half, dtype = np.int64)
+ for r in rewire.tolist():
+  a, b = int(edges[r, 0]), int(edges[r, 1])
+  if degree[a] >= n - 1:
+   continue
+  w = random.randrange(n)
+  while w == a or min(a, w)*n + max(a, w) in present:
+   w = random.randrange(n)
+  present.discard(min(a, b)*n + max(a, b))
+  present.add(min(a, w)*n + max(a, w))
+  degree[b] -= 1
+  degree[w] += 1
+  edges[r, 1] = w
+
+ return(edges)
+
+def isBridge(net, a, b):
+
+ #True if removing tie (a, b) would disconnect a from b (note 5)
+ return(not nx.has_path(nx.restricted_view(net, [], [(a, b)]), a, b))
+
+def repairConnectivity(net):
+
+ #returns the number of repairs, or None if no non-bridge tie is left to move
+ nodes = list(net)
+ members = {}
+ compOf = {}
+ ties = {}
+ for c, comp in enumerate(nx.connected_components(net)):
+  members[c] = list(comp)
+  ties[c] = sum(d for i, d in net.degree(comp))//2
+  for i in comp:
+   compOf[i] = c
+ #(size, component) pairs. Entries left behind by merges are skipped when popped
+ heap = [(len(m), c) for c, m in members.items()]
+ heapq.heapify(heap)
+
+ repairs = 0
+ while len(members) > 1:
+  while heap[0][1] not in members or len(members[heap[0][1]]) != heap[0][0]:
+   heapq.heappop(heap)
+  small = heap[0][1]
+  s = random.choice(members[small])
+  t = random.choice(nodes)
+  while compOf[t] == small:
+   t = random.choice(nodes)
+  alters = list(net[t])
+  random.shuffle(alters)
+  b = next((b for b in alters if not isBridge(net, t, b)), None)
+  if b is not None:
+   net.remove_edge(t, b)
+   ties[compOf[t]] -= 1
+  else:
+   cyclic = [c for c in members if ties[c] >= len(members[c])]
+   if not cyclic:
+    return(None)
+   c = min(cyclic, key = lambda c: len(members[c]))
+   cycle = nx.find_cycle(net, random.choice(members[c]))
+   net.remove_edge(*random.choice(cycle)[:2])
+   ties[c] -= 1
+  net.add_edge(s, t)
+  repairs += 1
+  #merge the smaller of s's and t's components into the larger
+  keep, drop = compOf[s], compOf[t]
+  if len(members[keep]) < len(members[drop]):
+   keep, drop = drop, keep
+  for i in members[drop]:
+   compOf[i] = keep
+  members[keep].extend(members.pop(drop))
+  ties[keep] += ties.pop(drop) + 1
+  heapq.heappush(heap, (len(members[keep]), keep))
+
+ return(repairs)
+
+def connectedWS(n, k, p):
+
+ #returns (net, repairs). fastWS requires k >= 2, so repair cannot run out of non-bridge
+  #ties (note 3)
+ net = edgesToGraph(n, fastWS(n, k, p))
+ repairs = repairConnectivity(net)
+ if repairs is None:
+  raise ValueError('could not build a connected SW graph (n = %s, k = %s, p = %s)' % (n, k, p))
+ return(net, repairs)
+
+###############################
+#STEP 4: Conversion to a networkx graph
+###############################
+
+def edgesToGraph(n, edges):
+
+ net = nx.Graph()
+ net.add_nodes_from(range(n))
+ net.add_edges_from(edges.tolist())
+ return(net)
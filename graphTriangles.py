@@ -0,0 +1,100 @@
+###############################
+#Name: graphTriangles.py
+#Created by: XXX
+#Created: XXX
+#Desc: Program enumerates a graph's triangles and wedges in a single pass. For every tie it
+# finds the shared alters of the two endpoints once, and from those lists derives per-node
+# triangle counts, node clustering, average clustering, and transitivity. graphGen stores the
+# result on the graph (net.graph['triWedge']) and constraintDecomp reuses the shared-alter
+# lists instead of re-intersecting alter sets for every edge.
+#Depends on:
+#Used by: graphGen.py, constraintDecomp.py
+#Notes:
+# 1/ Ties are treated as undirected: for a DiGraph, a node's alters are its successors and
+#  predecessors, which is what constraintDecomp uses after adding empty reverse edges.
+# 2/ Self-loops are ignored, as in networkx's clustering functions. constraintDecomp does not
+#  use the cached pass on graphs with self-loops.
+# 3/ Clustering values match nx.clustering, nx.average_clustering, and nx.transitivity on the
+#  (unweighted) undirected graph.
+###############################
+
+###############################
+#STEP 0: Import modules/functions
+###############################
+
+import networkx as nx
+
+###############################
+#Define triangleWedgePass to compute shared alters and clustering metrics together
+###############################
+
+def triangleWedgePass(net):
+
+ #undirected alter sets, without self-loops
+ if net.is_directed():
+  nbrs = {i: (set(net.succ[i]) | set(net.pred[i])) - {i} for i in net}
+ else:
+  nbrs = {i: set(net[i]) - {i} for i in net}
+
+ #visit each undirected tie once, using node order so node ids need not be comparable
+ order = {i: n for n, i in enumerate(nbrs)}
+ shared = {}
+ triangles = dict.fromkeys(nbrs, 0)
+ numEdges = 0
+ for i in nbrs:
+  for j in nbrs[i]:
+   if order[j] < order[i]:
+    continue
+   sharedAlters = list(nbrs[i] & nbrs[j])
+   shared[(i, j)] = sharedAlters
+   shared[(j, i)] = sharedAlters
+   #each triangle at i is seen from both of i's ties in it
+   triangles[i] += len(sharedAlters)
+   triangles[j] += len(sharedAlters)
+   numEdges += 1
+
+ clustering = {}
+ tri = 0
+ wedges = 0
+ for i in nbrs:
+  d = len(nbrs[i])
+  tri += triangles[i]
+  wedges += d*(d - 1)
+  triangles[i] = triangles[i]//2
+  if d > 1:
+   clustering[i] = 2*triangles[i]/(d*(d - 1))
+  else:
+   clustering[i] = 0.0
+
+ if len(nbrs) > 0:
+  avgCC = sum(clustering.values())/len(nbrs)
+ else:
+  avgCC = 0.0
+ if tri > 0:
+  transitivity = tri/wedges
+ else:
+  transitivity = 0.0
+
+ return({'nbrs': nbrs, 'shared': shared, 'triangles': triangles, 'clustering': clustering,
+  'avgCC': avgCC, 'transitivity': transitivity, 'numEdges': numEdges})
+
+###############################
+#Define triWedgeValid to check a cached pass still describes net's tie structure
+###############################
+
+def triWedgeValid(tw, net):
+
+ #every node's undirected alter set must still match the pass, so a tie rewired after
+  #graphGen is caught even when node and tie counts are unchanged. O(E), like the pass
+ if tw is None or len(tw['nbrs']) != len(net) or nx.number_of_selfloops(net) > 0:
+  return(False)
+ for i, alters in tw['nbrs'].items():
+  if i not in net:
+   return(False)
+  if net.is_directed():
+   current = set(net.succ[i]) | set(net.pred[i])
+  else:
+   current = set(net[i])
+  if current != alters:
+   return(False)
+ return(True)
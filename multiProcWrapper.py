@@ -8,6 +8,12 @@
 #
 #NOTES:
 #	1/ Tested in Windows 7 64-bit environments.
+#	2/ If constraintSimParams.adaptiveStopping = 1, a shared adaptive stopping controller
+#	 (adaptiveStopping.py) allocates sims to the processes until every stratum has converged.
+#	3/ If constraintSimParams.singleWriter = 1, the processes hand their results to one writer
+#	 process over shared memory (resultPipeline.py) instead of each connecting to the DB.
+#	4/ The wrapper creates the DB tables and reads the first unused sim_id once, before
+#	 starting the processes, so every run's sim_ids follow the previous run's.
 ########################################################
 
 ########################################################
@@ -15,7 +21,11 @@
 ########################################################
 
 import multiprocessing
+import constraintSimParams as cSP
 from constraintSim import constraintSim
+from adaptiveStopping import startController
+from resultPipeline import ResultPipeline
+import simSchema
 #import sys, os	
 
 ########################################################
@@ -27,10 +37,41 @@ num_cores = multiprocessing.cpu_count() - 1
 print(num_cores)
 
 if __name__ == '__main__':
+ #create the tables once, and continue sim_ids from the DB (simSchema.py note 7)
+ firstId = simSchema.prepareDB()
+
+ controller = None
+ if cSP.adaptiveStopping == 1:
+  manager, controller = startController(cSP, firstId)
+ pipeline = None
+ if cSP.singleWriter == 1:
+  pipeline = ResultPipeline(num_cores, cSP.ringGraphCapacity, cSP.ringEgoCapacity, 
+   cSP.writerBatchSize, cSP.writerPollInterval)
+
  jobs = []
  for i in range(num_cores):
   #print('allocating jobs to cores')
-  p = multiprocessing.Process(target=constraintSim, args=(i,))
+  sink = None
+  if pipeline is not None:
+   sink = pipeline.sinkSpec(i)
+  p = multiprocessing.Process(target=constraintSim, args=(i, controller, sink, firstId))
   jobs.append(p)
   p.start()
 
+ #the controller's manager and the writer must outlive the sims. While waiting, stop the
+  #sims if the writer has died (resultPipeline.py note 7)
+ if controller is not None or pipeline is not None:
+  for p in jobs:
+   p.join(1.0)
+   while p.is_alive():
+    if pipeline is not None:
+     pipeline.check()
+    p.join(1.0)
+ if pipeline is not None:
+  pipeline.finish()
+ #report per-stratum precision at the end
+ if controller is not None:
+  for row in controller.summary():
+   print(row)
+  manager.shutdown()
+
@@ -0,0 +1,269 @@
+###############################
+#Name: resultPipeline.py
+#Created by: XXX
+#Created: XXX
+#Desc: Program implements a single-writer result pipeline. Each constraintSim process puts
+# its finished graphSum and ego_time rows, as numpy records, into its own pair of
+# shared-memory ring buffers. One writer process drains all rings in large batches and is
+# the only process that connects to the DB, so adding compute workers does not add DB
+# connections or CREATE TABLE checks.
+#Depends on:
+# simSchema.py
+#Used by: multiProcWrapper.py, constraintSim.py
+#Notes:
+# 1/ Enabled with constraintSimParams.singleWriter = 1. Ring capacities and the writer's batch
+#  size and poll interval are also set there.
+# 2/ Each ring has one producer (a compute worker) and one consumer (the writer). The header
+#  holds head (rows written), tail (rows drained), a closed flag, and a failed flag. A
+#  producer blocks while its ring is full.
+# 3/ Rows are published by advancing head after the records are written, and released by
+#  advancing tail after they are copied out. head, tail, and the closed flag are only read or
+#  written while holding the ring's lock (a multiprocessing.Lock, i.e. a semaphore), so the
+#  record copies are ordered against the counters on every platform, not only on x86's
+#  ordered stores. Copies happen outside the lock. A producer waiting on the lock gives up
+#  once the writer has failed (note 7).
+# 4/ Requires Python 3.8+ (multiprocessing.shared_memory).
+# 5/ Each pass drains every pending ego_time row and only the graphSum rows that were pending
+#  before that, so a graphSum row is never committed before its egos.
+# 6/ Each pass folds its graphSum rows into stratumSum (simSchema note 6) in the same commit.
+# 7/ If the writer fails (e.g., a DB error), it sets the failed flag on every ring before
+#  exiting, and the parent sets it too if it finds the writer dead (ResultPipeline.check).
+#  A producer's put then raises instead of computing sims whose rows would be dropped or
+#  blocking forever on a full ring, and finish() raises after the workers are done.
+###############################
+
+###############################
+#STEP 0: Import modules/functions
+###############################
+
+import multiprocessing
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+import simSchema
+
+###############################
+#STEP 1: Shared-memory ring buffer of numpy records
+###############################
+
+class RingBuffer:
+
+ #header: [head, tail, closed, failed]
+ headerSize = 4*8
+
+ def __init__(self, dtype, capacity, name = None, lock = None):
+
+  self.dtype = np.dtype(dtype)
+  self.capacity = capacity
+  self.lock = multiprocessing.Lock() if lock is None else lock
+  size = self.headerSize + capacity*self.dtype.itemsize
+  if name is None:
+   self.shm = shared_memory.SharedMemory(create = True, size = size)
+  else:
+   self.shm = shared_memory.SharedMemory(name = name)
+  self.header = np.ndarray(4, dtype = np.int64, buffer = self.shm.buf)
+  self.data = np.ndarray(capacity, dtype = self.dtype, buffer = self.shm.buf, offset = self.headerSize)
+  if name is None:
+   self.header[:] = 0
+
+ def spec(self):
+  #what a worker needs to attach to this ring
+  return((self.shm.name, self.dtype.descr, self.capacity, self.lock))
+
+ def acquire(self, pollInterval = 0.01):
+
+  #a writer that died holding the lock has also failed the ring, so stop waiting then
+  while not self.lock.acquire(timeout = pollInterval):
+   if self.failed():
+    raise RuntimeError('result writer has failed; no more rows can be written')
+
+ def counters(self, head = None, tail = None):
+
+  #returns (head, tail), after setting either if given. Always under the lock (note 3)
+  self.acquire()
+  try:
+   if head is not None:
+    self.header[0] = head
+   if tail is not None:
+    self.header[1] = tail
+   return(int(self.header[0]), int(self.header[1]))
+  finally:
+   self.lock.release()
+
+ def put(self, records, pollInterval = 0.01):
+
+  n = len(records)
+  done = 0
+  while done < n:
+   if self.failed():
+    raise RuntimeError('result writer has failed; no more rows can be written')
+   head, tail = self.counters()
+   free = self.capacity - (head - tail)
+   if free == 0:
+    time.sleep(pollInterval)
+    continue
+   #copy as much as fits, in at most two slices around the end of the ring
+   k = min(free, n - done)
+   start = head % self.capacity
+   first = min(k, self.capacity - start)
+   self.data[start:start + first] = records[done:done + first]
+   self.data[:k - first] = records[done + first:done + k]
+   self.counters(head = head + k)
+   done += k
+
+ def drain(self, maxRows):
+
+  head, tail = self.counters()
+  k = min(head - tail, maxRows)
+  start = tail % self.capacity
+  first = min(k, self.capacity - start)
+  out = np.concatenate((self.data[start:start + first], self.data[:k - first]))
+  self.counters(tail = tail + k)
+  return(out)
+
+ def pending(self):
+  head, tail = self.counters()
+  return(head - tail)
+
+ def close(self):
+  self.acquire()
+  self.header[2] = 1
+  self.lock.release()
+
+ def closed(self):
+  self.acquire()
+  closed = self.header[2] == 1
+  self.lock.release()
+  return(closed)
+
+ def fail(self):
+  self.header[3] = 1
+
+ def failed(self):
+  return(self.header[3] == 1)
+
+ def detach(self):
+  del self.header, self.data
+  self.shm.close()
+
+###############################
+#STEP 2: Worker side. ResultSink attaches to one worker's rings
+###############################
+
+class ResultSink:
+
+ def __init__(self, spec):
+  graphSpec, egoSpec = spec
+  self.graphRing = RingBuffer(graphSpec[1], graphSpec[2], name = graphSpec[0], lock = graphSpec[3])
+  self.egoRing = RingBuffer(egoSpec[1], egoSpec[2], name = egoSpec[0], lock = egoSpec[3])
+
+ def put(self, graphRow, egoRows):
+  #egos first, so the writer never sees a graphSum row before its egos
+  self.egoRing.put(simSchema.rowsToRecords(egoRows, 'ego_time'))
+  self.graphRing.put(simSchema.rowsToRecords([graphRow], 'graphSum'))
+
+ def close(self):
+  self.egoRing.close()
+  self.graphRing.close()
+  self.egoRing.detach()
+  self.graphRing.detach()
+
+###############################
+#STEP 3: Writer process. Drains every ring in batches until all rings are closed and empty
+###############################
+
+def writeRows(c, table, records, batchSize):
+
+ rows = simSchema.recordsToRows(records)
+ for b in range(0, len(rows), batchSize):
+  c.executemany(simSchema.insertSQL(table), rows[b:b + batchSize])
+
+def writerMain(specs, batchSize, pollInterval):
+
+ rings = [ResultSink(spec) for spec in specs]
+ try:
+  writerLoop(rings, batchSize, pollInterval)
+ except BaseException:
+  #stop the producers (note 7)
+  for r in rings:
+   r.egoRing.fail()
+   r.graphRing.fail()
+  raise
+ finally:
+  for r in rings:
+   r.egoRing.detach()
+   r.graphRing.detach()
+
+def writerLoop(rings, batchSize, pollInterval):
+
+ cnxn = simSchema.connect()
+ c = cnxn.cursor()
+ #pyodbc can send a whole batch in one round trip
+ if hasattr(c, 'fast_executemany'):
+  c.fast_executemany = True
+ simSchema.createTables(c)
+ cnxn.commit()
+
+ while True:
+  finished = all(r.graphRing.closed() and r.egoRing.closed() for r in rings)
+
+  #count graph rows first: their egos were put before them, so draining every pending ego
+   #row afterwards keeps each graphSum row behind its egos
+  graphCounts = [r.graphRing.pending() for r in rings]
+  egos = np.concatenate([r.egoRing.drain(r.egoRing.pending()) for r in rings])
+  graphs = np.concatenate([r.graphRing.drain(k) for r, k in zip(rings, graphCounts)])
+
+  if len(egos) or len(graphs):
+   writeRows(c, 'ego_time', egos, batchSize)
+   writeRows(c, 'graphSum', graphs, batchSize)
+   simSchema.updateStratumSum(c, simSchema.recordsToRows(graphs))
+   cnxn.commit()
+  elif finished:
+   break
+  else:
+   time.sleep(pollInterval)
+
+ cnxn.close()
+
+###############################
+#STEP 4: Parent side. ResultPipeline creates the rings and runs the writer process
+###############################
+
+class ResultPipeline:
+
+ def __init__(self, numWorkers, graphCapacity, egoCapacity, batchSize, pollInterval):
+
+  self.rings = [(RingBuffer(simSchema.recordDtype('graphSum'), graphCapacity),
+   RingBuffer(simSchema.recordDtype('ego_time'), egoCapacity)) for i in range(numWorkers)]
+  self.writer = multiprocessing.Process(target = writerMain,
+   args = ([self.sinkSpec(i) for i in range(numWorkers)], batchSize, pollInterval))
+  self.writer.start()
+
+ def sinkSpec(self, i):
+  #picklable description of worker i's rings, for ResultSink
+  return((self.rings[i][0].spec(), self.rings[i][1].spec()))
+
+ def check(self):
+  #returns False, and fails every ring so producers stop, if the writer has died (note 7)
+  if self.writer.exitcode is None or self.writer.exitcode == 0:
+   return(True)
+  for graphRing, egoRing in self.rings:
+   graphRing.fail()
+   egoRing.fail()
+  return(False)
+
+ def finish(self):
+  #call after the workers have exited. Closing every ring covers workers that died early
+  for graphRing, egoRing in self.rings:
+   graphRing.close()
+   egoRing.close()
+  self.writer.join()
+  for graphRing, egoRing in self.rings:
+   for ring in (graphRing, egoRing):
+    shm = ring.shm
+    ring.detach()
+    shm.unlink()
+  if self.writer.exitcode != 0:
+   raise RuntimeError('result writer failed (exit code %s); rows it had not committed were '
+    'not written' % self.writer.exitcode)
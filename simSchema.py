@@ -0,0 +1,311 @@
+###############################
+#Name: simSchema.py
+#Created by: XXX
+#Created: XXX
+#Desc: Program defines the output tables (graphSum, ego_time, edgelist_time, stratumSum) in
+# one place: column names and SQL types, keys and indexes, the DDL that creates them, the
+# INSERT statements, the incremental refresh of the stratumSum summary table, the numpy
+# record layouts used by the shared-memory result pipeline, and functions that turn a
+# decomposed graph into graphSum and ego_time rows.
+#Depends on: constraintSimParams.py (cSP)
+#Used by: constraintSim.py, resultPipeline.py, multiProcWrapper.py
+#Notes:
+# 1/ Column order matches the tables as originally created by constraintSim.py.
+# 2/ graphSum's correlation columns are listed in corrCols, in table order. Each has a
+#  nullable '<correlation>_se' bootstrap standard error column (constraintDecomp note 10).
+# 3/ createTables also adds columns missing from tables created by earlier versions (e.g.,
+#  swRepairs, cacheHit, and the _se columns). Added columns are appended to the table, so
+#  INSERTs name their columns. A graphSum table that already has the dropped swAttempts
+#  column keeps it, unused (NULL in new rows).
+# 4/ With cSP.sqlitePath set, connect() opens that SQLite file instead of the ODBC DSN, and
+#  the DDL and upserts use SQLite syntax. Everything else is shared between the two dialects.
+# 5/ ego_time and edgelist_time are clustered on (sim_id, time_id, ego_id[, alter_id]) and
+#  graphSum on sim_id, all unique. ix_graphSum_stratum covers the usual netType/tsMethod/netSize
+#  grouping (with sim_id for the join to ego_time). SQLite has no clustered or INCLUDE indexes,
+#  so there the keys are plain unique indexes and the covering columns are appended to the key.
+#  An older table can already hold duplicate keys (runs before sim_ids continued from the DB,
+#  see prepareDB). Its key is then created as a non-unique index, with a warning naming a
+#  duplicate; delete the duplicates and drop the index to get the unique key on a later run.
+# 6/ stratumSum holds, per (netType, tsMethod, netSize, symmetric), the sim count, total runTime,
+#  and the sum and sum of squares of every graphSum correlation, so stratum means and sds
+#  need no scan of graphSum. updateStratumSum folds each batch of graphSum rows in, in the
+#  same transaction as their INSERT; a new stratumSum table is backfilled from graphSum.
+# 7/ prepareDB creates the tables once and returns the first unused sim_id (one past the
+#  largest in graphSum or ego_time), so sim_ids continue across runs instead of restarting
+#  at 0 and colliding with the unique keys.
+###############################
+
+###############################
+#STEP 0: Import modules/functions
+###############################
+
+import networkx as nx
+import numpy as np
+import sqlite3
+
+import constraintSimParams as cSP
+
+###############################
+#STEP 1: Table definitions. Each column is (name, SQL type)
+###############################
+
+corrCols = ['Ci_DD', 'Ci_sizeEffect', 'Ci_varEffect', 'Ci_ID', 'Ci_TB', 'Ci_QS', 'Ci_OQD',
+ 'Ci_CQD', 'Ci_betweenness', 'Ci_clustering', 'Ci_degree', 'DD_sizeEffect', 'DD_varEffect',
+ 'DD_ID', 'DD_TB', 'DD_QS', 'DD_OQD', 'DD_CQD', 'DD_betweenness', 'DD_clustering',
+ 'DD_degree', 'sizeEffect_varEffect', 'sizeEffect_ID', 'sizeEffect_TB', 'sizeEffect_QS',
+ 'sizeEffect_OQD', 'sizeEffect_CQD', 'sizeEffect_betweenness', 'sizeEffect_clustering',
+ 'sizeEffect_degree', 'varEffect_ID', 'varEffect_TB', 'varEffect_QS', 'varEffect_OQD',
+ 'varEffect_CQD', 'varEffect_betweenness', 'varEffect_clustering', 'varEffect_degree',
+ 'ID_TB', 'ID_QS', 'ID_OQD', 'ID_CQD', 'ID_betweenness', 'ID_clustering', 'ID_degree',
+ 'TB_QS', 'TB_OQD', 'TB_CQD', 'TB_betweenness', 'TB_clustering', 'TB_degree', 'QS_OQD',
+ 'QS_CQD', 'QS_betweenness', 'QS_clustering', 'QS_degree', 'OQD_CQD', 'OQD_betweenness',
+ 'OQD_clustering', 'OQD_degree', 'CQD_betweenness', 'CQD_clustering', 'CQD_degree',
+ 'betweenness_clustering', 'betweenness_degree', 'clustering_degree',
+ 'betweenness_C_net_size', 'betweenness_C_net_var', 'betweenness_C_net_DD',
+ 'clustering_C_net_size', 'clustering_C_net_var', 'clustering_C_net_DD']
+
+graphSumCols = [('sim_id', 'int'), ('runTime', 'real'), ('netType', 'nvarchar(16)'), 
+ ('rewireP', 'real'), ('netSize', 'int'), ('densTarget', 'real'), ('densActual', 'real'), 
+ ('avgCC', 'real'), ('transitivity', 'real'), ('walkLen', 'int'), ('cc', 'real'), 
+ ('linkAdd', 'int'), ('avgDegree', 'real'), ('pTF', 'real'), ('tsMethod', 'nvarchar(16)'), 
+ ('tsExp', 'real'), ('symmetric', 'int')] + [(k, 'real') for k in corrCols] + \
+ [('swRepairs', 'int')] + [(k + '_se', 'real NULL') for k in corrCols] + \
+ [('cacheHit', 'int')]
+
+#ego_time columns, with the node attribute each one is written from
+egoTimeCols = [('sim_id', 'int'), ('time_id', 'int'), ('ego_id', 'int'), 
+ ('concentration', 'real NULL'), ('output', 'real'), ('input', 'real'), ('degCent', 'int'), 
+ ('Ci', 'real'), ('DD', 'real'), ('varTS', 'real'), ('sqAvgTS', 'real'), ('TD', 'real'), 
+ ('ID', 'real'), ('CQD', 'real'), ('OQD', 'real'), ('betweenness', 'real'), 
+ ('clustering', 'real'), ('sizeEffect', 'real'), ('varEffect', 'real')]
+egoTimeAttrs = ['conc', 'output', 'input', 'degree', 'Ci', 'DD', 'varTS', 'sqAvgTS', 'TB', 'ID',
+ 'CC', 'IR', 'betweenness', 'clustering', 'sizeEffect', 'varEffect']
+
+edgelistTimeCols = [('sim_id', 'int'), ('time_id', 'int'), ('ego_id', 'int'), ('alter_id', 'int'), 
+ ('tieStrength', 'real'), ('pij', 'real'), ('frequency', 'int'), ('aggIndirect', 'real')]
+
+#per-stratum aggregates of graphSum (note 6)
+stratumKeyCols = ['netType', 'tsMethod', 'netSize', 'symmetric']
+stratumSumCols = [(k, dict(graphSumCols)[k]) for k in stratumKeyCols] + \
+ [('nSims', 'int'), ('runTime_sum', 'float')] + \
+ [(k + s, 'float') for k in corrCols for s in ('_sum', '_sumSq')]
+
+tables = {'graphSum': graphSumCols, 'ego_time': egoTimeCols, 'edgelist_time': edgelistTimeCols,
+ 'stratumSum': stratumSumCols}
+
+#indexes (note 5), as (name, table, key columns, included columns, unique, clustered)
+indexes = [('ix_graphSum_key', 'graphSum', ['sim_id'], [], True, True),
+ ('ix_ego_time_key', 'ego_time', ['sim_id', 'time_id', 'ego_id'], [], True, True),
+ ('ix_edgelist_time_key', 'edgelist_time', ['sim_id', 'time_id', 'ego_id', 'alter_id'], [],
+  True, True),
+ ('ix_graphSum_stratum', 'graphSum', ['netType', 'tsMethod', 'netSize'], ['symmetric', 'sim_id'],
+  False, False),
+ ('ix_stratumSum_key', 'stratumSum', stratumKeyCols, [], True, True)]
+
+###############################
+#STEP 2: Connection, DDL, and INSERT statements
+###############################
+
+def connect():
+
+ if cSP.sqlitePath:
+  return(sqlite3.connect(cSP.sqlitePath, timeout = 60))
+ import pyodbc
+ return(pyodbc.connect("DSN=ConstraintSim"))
+
+def isSQLite(c):
+
+ return(isinstance(c, sqlite3.Cursor))
+
+def tableColumns(c, name):
+
+ #names of an existing table's columns, or [] if the table does not exist
+ if isSQLite(c):
+  c.execute('PRAGMA table_info(%s)' % name)
+  return([r[1] for r in c.fetchall()])
+ c.execute('select COLUMN_NAME from INFORMATION_SCHEMA.COLUMNS where TABLE_NAME = ?', name)
+ return([r[0] for r in c.fetchall()])
+
+def createIndexSQL(c, name, table, keys, include, unique, clustered):
+
+ if isSQLite(c):
+  return('create %sindex if not exists %s on %s (%s)' % ('unique ' if unique else '', name,
+   table, ', '.join(keys + include)))
+ sql = 'create %s%sclustered index %s on %s (%s)' % ('unique ' if unique else '',
+  '' if clustered else 'non', name, table, ', '.join(keys))
+ if include:
+  sql += ' include (%s)' % ', '.join(include)
+ return('''if not exists (select 1 from sys.indexes where name = '%s' and object_id = OBJECT_ID('%s'))
+  %s''' % (name, table, sql))
+
+def createTables(c):
+
+ #create any missing output tables, add any columns that an older version of a table lacks
+  #(see note 3), then create any missing keys and indexes (note 5)
+ newTables = []
+ for name, cols in tables.items():
+  existing = tableColumns(c, name)
+  if not existing:
+   #guarded, since another instance may create the table first
+   if isSQLite(c):
+    c.execute('create table if not exists %s (%s)' % (name, ', '.join('%s %s' % col for col in cols)))
+   else:
+    c.execute('''if not exists (select 1 from INFORMATION_SCHEMA.TABLES where TABLE_NAME ='%s') 
+    create table %s (%s)''' % (name, name, ', '.join('%s %s' % col for col in cols)))
+   newTables.append(name)
+  else:
+   for k, t in cols:
+    if k not in existing:
+     c.execute('alter table %s add %s%s %s' % (name, 'column ' if isSQLite(c) else '', k, t))
+ for name, table, keys, include, unique, clustered in indexes:
+  try:
+   c.execute(createIndexSQL(c, name, table, keys, include, unique, clustered))
+  except Exception:
+   dup = unique and duplicateKey(c, table, keys)
+   if not dup:
+    raise
+   #an older table with duplicate keys gets a non-unique index instead (note 5)
+   print('WARNING: %s has more than one row with (%s) = %s, so %s is created as a non-unique '
+    'index. Delete the duplicate rows and drop %s to get a unique key.' % (table, ', '.join(keys),
+    dup, name, name))
+   c.execute(createIndexSQL(c, name, table, keys, include, False, clustered))
+
+ #a new summary table starts from whatever graphSum already holds
+ if 'stratumSum' in newTables:
+  rebuildStratumSum(c)
+
+def duplicateKey(c, table, keys):
+
+ #one key value that occurs more than once in table, or None
+ c.execute('SELECT %s FROM %s GROUP BY %s HAVING count(*) > 1' % (', '.join(keys), table,
+  ', '.join(keys)))
+ row = c.fetchone()
+ if row is None:
+  return(None)
+ return(tuple(row))
+
+def nextSimId(c):
+
+ #one past the largest sim_id written so far (ego_time rows can be committed before their
+  #graphSum row), or 0 for an empty DB
+ ids = []
+ for table in ['graphSum', 'ego_time']:
+  c.execute('SELECT max(sim_id) FROM %s' % table)
+  ids.append(c.fetchone()[0])
+ ids = [i for i in ids if i is not None]
+ if not ids:
+  return(0)
+ return(max(ids) + 1)
+
+def prepareDB():
+
+ #create the tables and return the first unused sim_id (note 7)
+ cnxn = connect()
+ c = cnxn.cursor()
+ createTables(c)
+ cnxn.commit()
+ firstId = nextSimId(c)
+ cnxn.close()
+ return(firstId)
+
+def insertSQL(name):
+
+ #columns are named, so tables whose columns were added later (note 3) still line up
+ return('INSERT INTO %s (%s) VALUES (%s)' % (name, ', '.join(k for k, t in tables[name]), 
+  ', '.join(['?']*len(tables[name]))))
+
+###############################
+#STEP 3: Incremental refresh of the stratumSum summary table (note 6)
+###############################
+
+def stratumDeltas(rows):
+
+ #aggregate a batch of graphSum rows (graphSumCols order) into one delta row per stratum
+ pos = {k: n for n, (k, t) in enumerate(graphSumCols)}
+ deltas = {}
+ for r in rows:
+  key = tuple(r[pos[k]] for k in stratumKeyCols)
+  d = deltas.setdefault(key, [0, 0.0] + [0.0]*(2*len(corrCols)))
+  d[0] += 1
+  d[1] += r[pos['runTime']]
+  for n, k in enumerate(corrCols):
+   v = r[pos[k]]
+   if v is None or v != v:
+    v = 0.0
+   d[2 + 2*n] += v
+   d[3 + 2*n] += v*v
+ return(deltas)
+
+def upsertStratumSQL(c):
+
+ #adds a delta row to its stratum's totals, inserting the stratum if it is new. One
+  #statement, so concurrent writers cannot both insert the same stratum
+ keys = ', '.join(stratumKeyCols)
+ sums = [k for k, t in stratumSumCols if k not in stratumKeyCols]
+ if isSQLite(c):
+  return('INSERT INTO stratumSum (%s) VALUES (%s) ON CONFLICT (%s) DO UPDATE SET %s' % (
+   ', '.join(k for k, t in stratumSumCols), ', '.join(['?']*len(stratumSumCols)), keys,
+   ', '.join('%s = %s + excluded.%s' % (k, k, k) for k in sums)))
+ return('''MERGE stratumSum with (holdlock) as t using (select %s) as s (%s) on %s
+  when matched then update set %s
+  when not matched then insert (%s) values (%s);''' % (', '.join(['?']*len(stratumSumCols)),
+  ', '.join(k for k, t in stratumSumCols), ' and '.join('t.%s = s.%s' % (k, k) for k in stratumKeyCols),
+  ', '.join('%s = t.%s + s.%s' % (k, k, k) for k in sums),
+  ', '.join(k for k, t in stratumSumCols), ', '.join('s.%s' % k for k, t in stratumSumCols)))
+
+def updateStratumSum(c, rows):
+
+ #call with the graphSum rows just inserted, before committing them
+ deltas = stratumDeltas(rows)
+ if deltas:
+  c.executemany(upsertStratumSQL(c), [key + tuple(d) for key, d in deltas.items()])
+
+def rebuildStratumSum(c):
+
+ #recompute stratumSum from scratch out of graphSum
+ keys = ', '.join(stratumKeyCols)
+ sums = ['count(*)', 'sum(runTime)']
+ for k in corrCols:
+  sums += ['sum(coalesce(%s, 0))' % k, 'sum(coalesce(%s, 0)*coalesce(%s, 0))' % (k, k)]
+ c.execute('DELETE FROM stratumSum')
+ c.execute('INSERT INTO stratumSum (%s) SELECT %s, %s FROM graphSum GROUP BY %s' % (
+  ', '.join(k for k, t in stratumSumCols), keys, ', '.join(sums), keys))
+
+###############################
+#STEP 4: Rows from a decomposed graph, and numpy record layouts for the same rows
+###############################
+
+def graphSumRow(sim_id, runTime, net):
+
+ values = {'sim_id': sim_id, 'runTime': runTime, 'densTarget': net.graph['netDensity'],
+  'densActual': nx.density(net)}
+ return(tuple(values[k] if k in values else net.graph[k] for k, t in graphSumCols))
+
+def egoTimeRows(sim_id, net, time_id = 1):
+
+ return([(sim_id, time_id, i) + tuple(net.nodes[i][k] for k in egoTimeAttrs) for i in net])
+
+def recordDtype(name):
+
+ #int -> int64, real -> float64, nvarchar(16) -> 16-character unicode
+ fields = []
+ for k, t in tables[name]:
+  if t.startswith('int'):
+   fields.append((k, np.int64))
+  elif t.startswith('real'):
+   fields.append((k, np.float64))
+  else:
+   fields.append((k, 'U16'))
+ return(np.dtype(fields))
+
+def rowsToRecords(rows, name):
+
+ #Python tuples to numpy records, with NULL (None) stored as NaN
+ rows = [tuple(float('nan') if v is None else v for v in r) for r in rows]
+ return(np.array(rows, dtype = recordDtype(name)))
+
+def recordsToRows(records):
+
+ #numpy records back to Python tuples for the DB driver, with NaN written as NULL
+ rows = records.tolist()
+ return([tuple(None if isinstance(v, float) and v != v else v for v in r) for r in rows])